@@ -27,8 +27,9 @@ from mygpo.maintenance.merge import IncorrectMergeException
 from mygpo.administration.clients import UserAgentStats, ClientStats
 from mygpo.users.views.registration import send_activation_email
 from mygpo.administration.tasks import merge_podcasts
-from mygpo.utils import get_git_head
-from mygpo.data.models import PodcastUpdateResult
+from mygpo.utils import get_git_head, percentile
+from mygpo.data.models import PodcastUpdateResult, UPDATE_PHASES
+from mygpo.data import notifications
 from mygpo.users.models import UserProxy
 from mygpo.publisher.models import PublishedPodcast
 from mygpo.api.httpresponse import JsonResponse
@@ -63,6 +64,7 @@ class HostInfo(AdminView):
         feed_queue_status = self._get_feed_queue_status()
         num_index_outdated = self._get_num_outdated_search_index()
         avg_podcast_update_duration = self._get_avg_podcast_update_duration()
+        update_phase_durations = self._get_update_phase_durations()
 
         return self.render_to_response(
             {
@@ -73,6 +75,8 @@ class HostInfo(AdminView):
                 "django_version": django_version,
                 "num_celery_tasks": self._get_waiting_celery_tasks(),
                 "avg_podcast_update_duration": avg_podcast_update_duration,
+                "update_phase_durations": update_phase_durations,
+                "pubsub_stats": notifications.get_stats(),
                 "feed_queue_status": feed_queue_status,
                 "num_index_outdated": num_index_outdated,
             }
@@ -92,9 +96,35 @@ class HostInfo(AdminView):
         queryset = PodcastUpdateResult.objects.filter(successful=True)
         return queryset.aggregate(avg_duration=Avg("duration"))["avg_duration"]
 
+    def _get_update_phase_durations(self, num_results=1000):
+        """Percentiles of the phase durations of the most recent updates"""
+        results = PodcastUpdateResult.objects.filter(successful=True)
+        results = results.values_list("phase_durations", flat=True)[:num_results]
+
+        durations = {phase: [] for phase in UPDATE_PHASES}
+        for phase_durations in results:
+            for phase, duration in phase_durations.items():
+                durations.setdefault(phase, []).append(duration)
+
+        for values in durations.values():
+            values.sort()
+
+        return [
+            {
+                "phase": phase,
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+            }
+            for phase, values in durations.items()
+        ]
+
     def _get_feed_queue_status(self):
         now = datetime.utcnow()
-        next_podcast = Podcast.objects.all().order_by_next_update().first()
+        next_podcast = (
+            Podcast.objects.exclude(next_update=None).order_by_next_update().first()
+        )
 
         delta = next_podcast.next_update - now
         delta_mins = delta.total_seconds() / 60
@@ -3,6 +3,10 @@ from itertools import count
 from django.utils.text import slugify
 
 
+# maximum length of a slug, see mygpo.podcasts.models.Slug
+MAX_SLUG_LENGTH = 150
+
+
 class SlugGenerator(object):
     """Generates a unique slug for an object"""
 
@@ -24,18 +28,19 @@ class SlugGenerator(object):
 
         if self.obj.slug:
             # The object already has a slug
-            raise StopIteration
+            return
 
         if not self.base_slug:
-            raise StopIteration
+            return
 
         # first we try with the base slug
-        yield str(self.base_slug)
+        yield str(self.base_slug[:MAX_SLUG_LENGTH])
 
         for n in count(1):
-            tmp_slug = "%s-%d" % (self.base_slug, n)
+            suffix = "-%d" % n
+            base_slug = self.base_slug[: MAX_SLUG_LENGTH - len(suffix)]
             # slugify returns SafeUnicode, we need a plain string
-            yield str(tmp_slug)
+            yield str(base_slug + suffix)
 
 
 class PodcastGroupSlugs(SlugGenerator):
@@ -82,3 +87,23 @@ class EpisodeSlugs(SlugGenerator):
             return slugify(obj.title)
 
         return None
+
+
+def pick_unused_slugs(generators, used_slugs):
+    """Picks the first unused slug of each generator
+
+    used_slugs is a set of the slugs that are already in use within the
+    scope; the picked slugs are added to it. Returns a list with one slug
+    (or None) per generator.
+
+    >>> used = {'a', 'a-1'}
+    >>> pick_unused_slugs([['a', 'a-1', 'a-2'], ['a', 'a-2', 'a-3']], used)
+    ['a-2', 'a-3']
+    """
+    slugs = []
+    for generator in generators:
+        slug = next((slug for slug in generator if slug not in used_slugs), None)
+        if slug is not None:
+            used_slugs.add(slug)
+        slugs.append(slug)
+    return slugs
@@ -19,6 +19,12 @@ class PodcastUpdateResultAdmin(admin.ModelAdmin):
         "error_message",
         "podcast_created",
         "episodes_added",
+        "episodes_outdated",
+        "episodes_unchanged",
+        "podcast_unchanged",
+        "not_modified",
+        "consecutive_failures",
+        "phase_durations",
     ]
 
     def title(self, res):
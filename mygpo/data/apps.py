@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.conf import settings
+
 from mygpo.pubsub.signals import subscription_updated
 
 import logging
@@ -8,10 +10,17 @@ logger = logging.getLogger(__name__)
 
 def update_podcast(sender, **kwargs):
     """update podcast in background when receiving pubsub-notification"""
-    from mygpo.data.tasks import update_podcasts
+    from mygpo.data.tasks import update_notified_podcast
+    from mygpo.data.notifications import add_pending
+
+    if not add_pending(sender):
+        logger.info('update of podcast "%s" is already pending', sender)
+        return
 
     logger.info('updating podcast for "%s" after pubsub notification', sender)
-    update_podcasts.delay([sender])
+    update_notified_podcast.apply_async(
+        [sender], countdown=settings.PUBSUB_UPDATE_DELAY
+    )
 
 
 class DataAppConfig(AppConfig):
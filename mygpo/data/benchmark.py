@@ -0,0 +1,282 @@
+"""Offline benchmark of the feed update pipeline
+
+Feed-service responses are replayed by a local stub of the feed-service, so
+that update_podcasts can be measured without any network access. The
+benchmark runs several scenarios over a corpus of payloads, and reports wall
+time, feeds per second and the number of queries and the duration of each
+update phase. All changes to the database are rolled back afterwards.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+from django.db import connection, transaction
+from django.test import override_settings
+
+from mygpo.data import feeddownloader
+from mygpo.data.models import PodcastUpdateResult, UPDATE_PHASES, get_running_phase
+from mygpo.web.tasks import create_thumbnails
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# base URL of the feeds in the corpus
+FEED_URL = "http://benchmark.invalid/{name}.xml"
+
+
+def synthetic_payload(name, num_episodes):
+    """Returns a feed-service response for a podcast with the given episodes"""
+    return {
+        "title": "Benchmark Podcast {}".format(name),
+        "description": "A podcast for benchmarking feed updates",
+        "link": "http://benchmark.invalid/{}".format(name),
+        "language": "en",
+        "content_types": ["audio"],
+        "urls": [FEED_URL.format(name=name)],
+        "episodes": [
+            {
+                "guid": "{}-episode-{}".format(name, n),
+                "title": "Episode {}".format(n),
+                "description": "Description of episode {}".format(n),
+                "released": 1500000000 + n * 86400,
+                "duration": 3600,
+                "files": [
+                    {
+                        "urls": ["http://benchmark.invalid/{}/{}.mp3".format(name, n)],
+                        "filesize": 10000000 + n,
+                        "mimetype": "audio/mpeg",
+                    }
+                ],
+            }
+            for n in range(num_episodes)
+        ],
+    }
+
+
+def synthetic_corpus(num_feeds, num_episodes):
+    """Returns a dict of feed URLs and feed-service responses"""
+    corpus = {}
+    for n in range(num_feeds):
+        name = "feed-{}-{}".format(num_episodes, n)
+        corpus[FEED_URL.format(name=name)] = synthetic_payload(name, num_episodes)
+    return corpus
+
+
+def load_corpus(path):
+    """Loads recorded feed-service responses from the JSON files in path"""
+    corpus = {}
+    for filename in sorted(os.listdir(path)):
+        name, ext = os.path.splitext(filename)
+        if ext != ".json":
+            continue
+
+        with open(os.path.join(path, filename)) as f:
+            payload = json.load(f)
+
+        # the feed-service returns a list of podcasts
+        if isinstance(payload, list):
+            payload = payload[0]
+
+        corpus[FEED_URL.format(name=name)] = payload
+    return corpus
+
+
+class FeedServiceStub(object):
+    """Serves recorded feed-service responses on a local port
+
+    Responses carry an ETag, so conditional requests are answered with
+    "304 Not Modified" like by the real feed-service."""
+
+    def __init__(self, corpus):
+        self.responses = {}
+        for url, payload in corpus.items():
+            body = json.dumps([payload]).encode("utf-8")
+            self.responses[url] = (body, hashlib.sha1(body).hexdigest())
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return "http://{}:{}/".format(host, port)
+
+    def __enter__(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        responses = self.responses
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                url = query.get("url", [None])[0]
+
+                if url not in responses:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                body, etag = responses[url]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class QueryCounter(object):
+    """Counts the executed queries by the update phase they belong to"""
+
+    def __init__(self):
+        self.queries = defaultdict(int)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries[get_running_phase() or "other"] += 1
+        return execute(sql, params, many, context)
+
+
+class ScenarioResult(object):
+    """Measurements of one benchmark scenario"""
+
+    def __init__(self, name, num_feeds, duration, queries, phase_durations):
+        self.name = name
+        self.num_feeds = num_feeds
+        self.duration = duration
+        self.queries = queries
+        self.phase_durations = phase_durations
+
+    @property
+    def feeds_per_second(self):
+        return self.num_feeds / self.duration if self.duration else 0
+
+    @property
+    def total_queries(self):
+        return sum(self.queries.values())
+
+
+def run_scenario(name, urls):
+    """Updates the podcasts at urls and returns the measurements"""
+    scenario_start = datetime.utcnow()
+    counter = QueryCounter()
+
+    with connection.execute_wrapper(counter):
+        start = time.monotonic()
+        for _podcast in feeddownloader.update_podcasts(urls):
+            pass
+        duration = time.monotonic() - start
+
+    phase_durations = defaultdict(float)
+    results = PodcastUpdateResult.objects.filter(start__gte=scenario_start)
+    for result_durations in results.values_list("phase_durations", flat=True):
+        for phase, phase_duration in result_durations.items():
+            phase_durations[phase] += phase_duration
+
+    return ScenarioResult(name, len(urls), duration, counter.queries, phase_durations)
+
+
+def run_benchmark(
+    num_feeds=50, num_episodes=20, num_large=5, large_episodes=2000, corpus_path=None
+):
+    """Runs all scenarios and returns their results
+
+    * import: the feeds of the corpus are updated for the first time
+    * unchanged: the same feeds are polled again without changes
+    * large: first-time imports of feeds with many episodes
+    """
+    if corpus_path:
+        corpus = load_corpus(corpus_path)
+    else:
+        corpus = synthetic_corpus(num_feeds, num_episodes)
+
+    large_corpus = synthetic_corpus(num_large, large_episodes)
+
+    scenarios = [
+        ("import", list(corpus)),
+        ("unchanged", list(corpus)),
+        ("large", list(large_corpus)),
+    ]
+
+    results = []
+    with FeedServiceStub(dict(corpus, **large_corpus)) as stub:
+        settings = override_settings(
+            FEEDSERVICE_URL=stub.url,
+            FEED_PARSER="mygpo.data.parsers.FeedServiceParser",
+        )
+
+        # hub subscriptions are handled in separate tasks
+        hub = mock.patch.object(feeddownloader, "subscribe_podcast_at_hub")
+
+        # logos would be downloaded and written to the media storage, which is
+        # not rolled back, and their thumbnails created in separate tasks
+        logo = mock.patch.object(
+            feeddownloader.CoverArt, "save_podcast_logo", side_effect=lambda url: url
+        )
+        thumbnails = mock.patch.object(create_thumbnails, "delay")
+
+        with settings, hub, logo, thumbnails, transaction.atomic():
+            for name, urls in scenarios:
+                logger.info("Running scenario %s with %d feeds", name, len(urls))
+                results.append(run_scenario(name, urls))
+
+            # the benchmark must not leave any data behind
+            transaction.set_rollback(True)
+
+    return results
+
+
+def format_results(results):
+    """Returns a textual report of the results"""
+    lines = []
+    for result in results:
+        lines.append(
+            "{name}: {feeds} feeds in {duration:.2f}s ({fps:.1f} feeds/s), "
+            "{queries} queries".format(
+                name=result.name,
+                feeds=result.num_feeds,
+                duration=result.duration,
+                fps=result.feeds_per_second,
+                queries=result.total_queries,
+            )
+        )
+
+        phases = UPDATE_PHASES + sorted(set(result.queries) - set(UPDATE_PHASES))
+        for phase in phases:
+            if phase not in result.queries and phase not in result.phase_durations:
+                continue
+
+            lines.append(
+                "  {phase:<12} {queries:>8} queries {duration:>9.3f}s".format(
+                    phase=phase,
+                    queries=result.queries.get(phase, 0),
+                    duration=result.phase_durations.get(phase, 0),
+                )
+            )
+
+    return "\n".join(lines)
@@ -2,16 +2,22 @@
 # -*- coding: utf-8 -*-
 
 import os.path
-from urllib.parse import urljoin
+import json
+import uuid
+import hashlib
 from datetime import datetime, timedelta
 from itertools import chain, islice
+import threading
+from queue import SimpleQueue
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
-from django.db import transaction
+from django.db import transaction, connection, IntegrityError
+from django.db.models import F
 from django.conf import settings
 
-from mygpo.podcasts.models import Podcast, Episode
-from mygpo.core.slugs import PodcastSlugs, EpisodeSlugs
+from mygpo.podcasts.models import Podcast, Episode, URL, Slug
+from mygpo.core.slugs import PodcastSlugs, EpisodeSlugs, pick_unused_slugs
 from mygpo.podcasts.models import (
     DEFAULT_UPDATE_INTERVAL,
     MIN_UPDATE_INTERVAL,
@@ -19,9 +25,10 @@ from mygpo.podcasts.models import (
 )
 from mygpo.utils import to_maxlength
 from mygpo.web.logo import CoverArt
-from mygpo.data.podcast import subscribe_at_hub
-from mygpo.data.tasks import update_related_podcasts
-from mygpo.pubsub.models import SubscriptionError
+from mygpo.data.hostlimit import host_slot, HostBusy
+from mygpo.data.parsers import get_parser, FeedNotModified
+from mygpo.data.tasks import subscribe_podcast_at_hub
+from mygpo.pubsub.models import HubSubscription
 from mygpo.directory.tags import update_category
 from mygpo.search import get_index_fields
 
@@ -50,28 +57,101 @@ def update_podcasts(queue):
     """Fetch data for the URLs supplied as the queue iterable"""
 
     for n, podcast_url in enumerate(queue, 1):
-        logger.info("Update %d - %s", n, podcast_url)
-        if not podcast_url:
-            logger.warning("Podcast URL empty, skipping")
-            continue
+        yield _update_podcast(n, podcast_url)
 
-        try:
-            updater = PodcastUpdater(podcast_url)
-            yield updater.update_podcast()
 
-        except NoPodcastCreated as npc:
-            logger.info("No podcast created: %s", npc)
+def update_podcasts_concurrently(queue, workers):
+    """Fetch data for the URLs in queue, using a pool of ``workers`` threads
+
+    Results are yielded as soon as the individual updates finish, so they
+    are not necessarily in the order of the queue. Each thread takes one URL
+    at a time from the queue, so it can be (very) long."""
+
+    queue = enumerate(queue, 1)
+    lock = threading.Lock()
+    results = SimpleQueue()
+
+    def next_podcast():
+        with lock:
+            return next(queue, None)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_update_podcasts_in_thread, next_podcast, results)
+            for _ in range(workers)
+        ]
+
+        running = len(futures)
+        while running:
+            result = results.get()
+            if result is _THREAD_FINISHED:
+                running -= 1
+            else:
+                yield result
+
+        # raise the errors of the threads, if any
+        for future in futures:
+            future.result()
+
 
-        except NoEpisodesException:
-            logger.info(f"No episodes found when parsing {podcast_url}")
-            continue
+# put into the results by a thread of update_podcasts_concurrently when it
+# has finished
+_THREAD_FINISHED = object()
 
-        except GeneratorExit:
-            pass
 
-        except:
-            logger.exception('Error while updating podcast "%s"', podcast_url)
-            raise
+def _update_podcasts_in_thread(next_podcast, results):
+    """Updates podcasts in a worker thread until the queue is exhausted
+
+    Each thread uses its own DB connection, which is closed when the thread
+    has finished so that no connections are leaked when the pool shuts
+    down."""
+    try:
+        while True:
+            podcast = next_podcast()
+            if podcast is None:
+                break
+
+            n, podcast_url = podcast
+            results.put(_update_podcast(n, podcast_url))
+
+    finally:
+        connection.close()
+        results.put(_THREAD_FINISHED)
+
+
+def _update_podcast(n, podcast_url):
+    """Updates a single podcast, returns None if it was skipped or failed
+
+    Errors are logged instead of raised, so that a failing podcast does not
+    prevent the updates of the other podcasts in the queue."""
+
+    logger.info("Update %d - %s", n, podcast_url)
+    if not podcast_url:
+        logger.warning("Podcast URL empty, skipping")
+        return None
+
+    try:
+        updater = PodcastUpdater(podcast_url)
+        with host_slot(podcast_url):
+            return updater.update_podcast()
+
+    except HostBusy as hb:
+        # the podcast is made due again, so that it is picked up by the next
+        # scheduling run instead of waiting for the host here
+        logger.info("Too many updates for host %s, skipping", hb)
+        now = datetime.utcnow()
+        Podcast.objects.filter(urls__url=podcast_url, next_update__gt=now).update(
+            next_update=now
+        )
+
+    except NoPodcastCreated as npc:
+        logger.info("No podcast created: %s", npc)
+
+    except NoEpisodesException:
+        logger.info(f"No episodes found when parsing {podcast_url}")
+
+    except Exception:
+        logger.exception('Error while updating podcast "%s"', podcast_url)
 
 
 class PodcastUpdater(object):
@@ -87,7 +167,18 @@ class PodcastUpdater(object):
 
         with models.PodcastUpdateResult(podcast_url=self.podcast_url) as res:
 
-            parsed, podcast, created = self.parse_feed()
+            try:
+                parsed, podcast, created = self.parse_feed(res)
+
+            except FeedNotModified as fnm:
+                # nothing to do, the podcast is exactly as it was
+                podcast = fnm.podcast
+                res.podcast = podcast
+                res.podcast_created = False
+                res.episodes_added = 0
+                res.not_modified = True
+                self._update_unchanged_podcast(podcast, res)
+                return podcast
 
             if not podcast:
                 res.podcast_created = False
@@ -108,22 +199,51 @@ class PodcastUpdater(object):
                 )
                 return
 
-            episode_updater.update_episodes(parsed.get("episodes", []))
+            with res.timer("episodes"):
+                episode_updater.update_episodes(parsed.get("episodes", []))
 
             podcast.refresh_from_db()
-            podcast.episode_count = episode_updater.count_episodes()
-            podcast.save()
 
-            episode_updater.order_episodes()
+            if episode_updater.episodes_changed:
+                with res.timer("order"):
+                    podcast.episode_count = episode_updater.count_episodes()
+                    podcast.save()
+
+                    episode_updater.order_episodes()
+
+            else:
+                # without changed episodes, the order stays the same
+                episode_updater.max_episode_order = podcast.max_episode_order
 
             self._update_podcast(podcast, parsed, episode_updater, res)
 
+            # the feed has been processed completely; from now on we can
+            # recognize if it hasn't changed
+            self.cache_info.save()
+
         return podcast
 
-    def parse_feed(self):
+    def parse_feed(self, update_result):
+        self.cache_info = models.HTTPCacheInfo.objects.for_url(self.podcast_url)
+
         try:
-            parsed = self._fetch_feed()
-            self._validate_parsed(parsed)
+            with update_result.timer("fetch"):
+                parsed = self._fetch_feed(self.cache_info)
+
+            with update_result.timer("parse"):
+                self._validate_parsed(parsed)
+
+        except FeedNotModified as fnm:
+            try:
+                podcast = Podcast.objects.get(urls__url=self.podcast_url)
+
+            except Podcast.DoesNotExist as pdne:
+                # the podcast has been removed since the last update;
+                # the next update will not be conditional anymore
+                self.cache_info.delete()
+                raise NoPodcastCreated(fnm) from pdne
+
+            raise FeedNotModified(podcast) from fnm
 
         except (requests.exceptions.RequestException, NoEpisodesException) as ex:
             logger.warn("Error while fetching/parsing feed", exc_info=True)
@@ -138,31 +258,19 @@ class PodcastUpdater(object):
                 raise NoPodcastCreated(ex) from pdne
 
         # Parsing went well, get podcast
-        podcast, created = Podcast.objects.get_or_create_for_url(self.podcast_url)
+        with update_result.timer("parse"):
+            podcast, created = Podcast.objects.get_or_create_for_url(self.podcast_url)
 
         return (parsed, podcast, created)
 
-    def _fetch_feed(self):
-        params = {"url": self.podcast_url, "process_text": "markdown"}
-        headers = {"Accept": "application/json"}
-        url = urljoin(settings.FEEDSERVICE_URL, "parse")
-        r = requests.get(url, params=params, headers=headers, timeout=30)
+    def _fetch_feed(self, cache_info=None):
+        """fetches the parsed feed using the configured parser backend
 
-        if r.status_code != 200:
-            logger.error(
-                'Feed-service status code for "{}" was {}'.format(url, r.status_code)
-            )
-            return None
-
-        try:
-            return r.json()[0]
-        except ValueError:
-            logger.exception(
-                'Feed-service error while parsing response for url "%s": %s',
-                self.podcast_url,
-                r.text,
-            )
-            raise
+        If cache information from a previous update is given, FeedNotModified
+        is raised if the feed has not changed. Otherwise the cache
+        information is set from the response."""
+        parser = get_parser(MAX_EPISODES_UPDATE)
+        return parser.parse(self.podcast_url, cache_info)
 
     def _validate_parsed(self, parsed):
         """validates the parsed results and raises an exception if invalid
@@ -176,6 +284,16 @@ class PodcastUpdater(object):
     def _update_podcast(self, podcast, parsed, episode_updater, update_result):
         """updates a podcast according to new parser results"""
 
+        fingerprint = get_podcast_fingerprint(parsed)
+        if (
+            fingerprint == podcast.content_fingerprint
+            and not episode_updater.episodes_changed
+        ):
+            self._update_unchanged_podcast(podcast, update_result)
+            return
+
+        podcast.content_fingerprint = fingerprint
+
         # we need that later to decide if we can "bump" a category
         prev_latest_episode_timestamp = podcast.latest_episode_timestamp
 
@@ -202,16 +320,23 @@ class PodcastUpdater(object):
 
         # podcast.tags['feed'] = parsed.tags or podcast.tags.get('feed', [])
 
+        if parsed.get("common_title"):
+            common_title = parsed["common_title"]
+        elif episode_updater.episodes_changed:
+            # the common title can only change with the episode titles
+            common_title = podcast.calc_common_episode_title() or ""
+        else:
+            common_title = podcast.common_episode_title
+
         podcast.common_episode_title = to_maxlength(
-            Podcast,
-            "common_episode_title",
-            parsed.get("common_title") or podcast.common_episode_title,
+            Podcast, "common_episode_title", common_title
         )
 
         podcast.new_location = parsed.get("new_location") or podcast.new_location
         podcast.flattr_url = to_maxlength(
             Podcast, "flattr_url", parsed.get("flattr") or podcast.flattr_url
         )
+        prev_hub = podcast.hub
         podcast.hub = parsed.get("hub") or podcast.hub
         podcast.license = parsed.get("license") or podcast.license
         podcast.max_episode_order = episode_updater.max_episode_order
@@ -230,37 +355,27 @@ class PodcastUpdater(object):
             except Podcast.DoesNotExist:
                 podcast.set_url(podcast.new_location)
 
-        # latest episode timestamp
-        episodes = Episode.objects.filter(
-            podcast=podcast, released__isnull=False
-        ).order_by("released")
-
-        # Determine update interval
+        # latest episode timestamp and intervals between releases
+        episode_updater.update_release_stats()
 
         # Update interval is based on intervals between episodes
-        podcast.update_interval = episode_updater.get_update_interval(episodes)
+        podcast.update_interval = episode_updater.get_update_interval()
 
-        # factor is increased / decreased depending on whether the latest
-        # update has returned episodes
-        if update_result.episodes_added == 0:  # no episodes, incr factor
-            newfactor = podcast.update_interval_factor * 1.2
-            podcast.update_interval_factor = min(1000, newfactor)  # never above 1000
-        elif update_result.episodes_added > 1:  # new episodes, decr factor
-            newfactor = podcast.update_interval_factor / 1.2
-            podcast.update_interval_factor = max(1, newfactor)  # never below 1
+        with update_result.timer("hub"):
+            self._update_hub_interval(podcast)
 
-        latest_episode = episodes.last()
-        if latest_episode:
-            podcast.latest_episode_timestamp = latest_episode.released
+        self._update_interval_factor(podcast, update_result.episodes_added)
 
         # podcast.episode_count is not update here on purpose. It is, instead,
         # continuously updated when creating new episodes in
         # EpisodeManager.get_or_create_for_url
 
-        self._update_categories(podcast, prev_latest_episode_timestamp)
+        with update_result.timer("categories"):
+            self._update_categories(podcast, prev_latest_episode_timestamp)
 
         # try to download the logo and reset logo_url to None on http errors
-        found = CoverArt.save_podcast_logo(podcast.logo_url)
+        with update_result.timer("logo"):
+            found = CoverArt.save_podcast_logo(podcast.logo_url)
         if not found:
             podcast.logo_url = None
 
@@ -273,29 +388,95 @@ class PodcastUpdater(object):
         # we need to record the last update
         logger.info("Saving podcast.")
         podcast.last_update = datetime.utcnow()
-        podcast.save()
+        podcast.backoff_until = None
+        with update_result.timer("save"):
+            podcast.save()
 
-        try:
-            subscribe_at_hub(podcast)
-        except SubscriptionError as se:
-            logger.warning("subscribing to hub failed: %s", str(se))
+        # subscriptions to known hubs are renewed by renew_hub_subscriptions
+        if podcast.hub and podcast.hub != prev_hub:
+            subscribe_podcast_at_hub.delay(podcast.pk)
+
+        with update_result.timer("slugs"):
+            self.assign_slug(podcast)
+            episode_updater.assign_missing_episode_slugs()
+
+    def _update_unchanged_podcast(self, podcast, update_result):
+        """records an update that did not find any changes
+
+        Logo, categories, etc can not have changed, so only the information
+        required for scheduling the next update is stored."""
+        logger.info("Podcast has not changed, skipping update.")
+        update_result.podcast_unchanged = True
+
+        self._update_interval_factor(podcast, update_result.episodes_added)
+        podcast.last_update = datetime.utcnow()
+        podcast.backoff_until = None
+        with update_result.timer("save"):
+            podcast.save(
+                update_fields=["last_update", "update_interval_factor", "backoff_until"]
+            )
+
+    def _update_interval_factor(self, podcast, episodes_added):
+        """adapts the update interval factor of the podcast
+
+        The factor is increased / decreased depending on whether the latest
+        update has returned episodes"""
+        if episodes_added == 0:  # no episodes, incr factor
+            newfactor = podcast.update_interval_factor * 1.2
+            podcast.update_interval_factor = min(1000, newfactor)  # never above 1000
+        elif episodes_added > 1:  # new episodes, decr factor
+            newfactor = podcast.update_interval_factor / 1.2
+            podcast.update_interval_factor = max(1, newfactor)  # never below 1
 
-        self.assign_slug(podcast)
-        episode_updater.assign_missing_episode_slugs()
-        update_related_podcasts.delay(podcast.pk)
+    def _update_hub_interval(self, podcast):
+        """lengthens the update interval of podcasts with a live hub subscription
+
+        The hub notifies about new episodes, so polling is only a fallback.
+        The subscription's lease has to last for the whole lengthened
+        interval; expired subscriptions are not live."""
+        if not podcast.hub:
+            return
+
+        interval = podcast.update_interval * settings.PUBSUB_POLL_INTERVAL_FACTOR
+        interval = min(int(interval), MAX_UPDATE_INTERVAL)
+
+        until = datetime.utcnow() + timedelta(hours=interval)
+        live = HubSubscription.objects.live(until).filter(
+            podcast=podcast, hub_url=podcast.hub
+        )
+        if live.exists():
+            podcast.update_interval = interval
 
     def assign_slug(self, podcast):
         if podcast.slug:
             return
 
-        for slug in PodcastSlugs(podcast):
-            try:
-                with transaction.atomic():
-                    podcast.add_slug(slug)
-                break
+        generator = PodcastSlugs(podcast)
+        if not generator.base_slug:
+            return
 
-            except:
-                continue
+        # only slugs that start with the base slug can collide
+        used_slugs = set(
+            Slug.objects.filter(
+                scope=podcast.scope, slug__startswith=generator.base_slug
+            ).values_list("slug", flat=True)
+        )
+        [slug] = pick_unused_slugs([generator], used_slugs)
+
+        try:
+            with transaction.atomic():
+                podcast.add_slug(slug)
+
+        except IntegrityError:
+            # the slug has been taken concurrently; try one after the other
+            for slug in PodcastSlugs(podcast):
+                try:
+                    with transaction.atomic():
+                        podcast.add_slug(slug)
+                    break
+
+                except IntegrityError:
+                    continue
 
     def _update_categories(self, podcast, prev_timestamp):
         """checks some practical requirements and updates a category"""
@@ -322,6 +503,7 @@ class PodcastUpdater(object):
 
     def _mark_outdated(self, podcast, msg, episode_updater):
         logger.info("marking podcast outdated: %s", msg)
+        episode_updater.update_result.error_message = msg
         podcast.outdated = True
         podcast.last_update = datetime.utcnow()
         podcast.save()
@@ -335,6 +517,9 @@ class MultiEpisodeUpdater(object):
         self.updated_episodes = []
         self.max_episode_order = None
 
+        # number of episodes that have been created or changed
+        self.episodes_changed = 0
+
     def update_episodes(self, parsed_episodes):
         episodes_to_update = list(islice(parsed_episodes, 0, MAX_EPISODES_UPDATE))
         logger.info(
@@ -342,7 +527,170 @@ class MultiEpisodeUpdater(object):
         )
 
         logger.info("Updating %d episodes", len(episodes_to_update))
-        for n, parsed in enumerate(episodes_to_update, 1):
+        episodes_added = self.update_result.episodes_added
+
+        try:
+            with transaction.atomic():
+                self._update_episodes_bulk(episodes_to_update)
+
+        except IntegrityError:
+            # some of the episodes or URLs have been created concurrently, eg
+            # by a pubsub-triggered update. Everything of the bulk update has
+            # been rolled back, so we start over one episode at a time
+            logger.warning("Bulk update of episodes failed", exc_info=True)
+            self.updated_episodes = []
+            self.episodes_changed = 0
+            self.update_result.episodes_added = episodes_added
+            self.update_result.episodes_unchanged = 0
+            self._update_episodes_individually(episodes_to_update)
+
+        # and mark the remaining ones outdated
+        self.mark_outdated_episodes()
+
+    def mark_outdated_episodes(self):
+        """Marks all episodes that have not been updated as outdated
+
+        Returns the number of episodes that have been marked outdated"""
+
+        now = datetime.utcnow()
+        updated_ids = [episode.pk for episode in self.updated_episodes]
+        num_outdated = (
+            Episode.objects.filter(podcast=self.podcast, outdated=False)
+            .exclude(pk__in=updated_ids)
+            .update(outdated=True, last_update=now, modified=now)
+        )
+
+        logger.info("Marked %d episodes as outdated", num_outdated)
+        self.update_result.episodes_outdated += num_outdated
+        return num_outdated
+
+    def _update_episodes_bulk(self, parsed_episodes):
+        """Updates the episodes with a constant number of queries
+
+        All URLs are resolved with a single query, missing episodes and URLs
+        are created with bulk_create and the changes are written with one
+        bulk_update."""
+
+        # parsed episodes by their (primary) URL
+        parsed_by_url = {}
+        for n, parsed in enumerate(parsed_episodes, 1):
+            url = self.get_episode_url(parsed)
+            if not url:
+                logger.info("Skipping episode %d for missing URL", n)
+                continue
+
+            url = to_maxlength(URL, "url", url)
+            parsed_by_url[url] = parsed
+
+        if not parsed_by_url:
+            return
+
+        all_urls = set(parsed_by_url)
+        for parsed in parsed_by_url.values():
+            all_urls.update(get_parsed_urls(parsed))
+
+        scope = self.podcast.as_scope
+        existing_urls = {
+            u.url: u for u in URL.objects.filter(scope=scope, url__in=all_urls)
+        }
+
+        episode_ids = [
+            existing_urls[url].object_id
+            for url in parsed_by_url
+            if url in existing_urls
+        ]
+        episodes = Episode.objects.filter(pk__in=episode_ids).prefetch_related("urls")
+        episodes = {episode.pk: episode for episode in episodes}
+
+        new_episodes = []
+        new_urls = []
+        reassigned_urls = []
+        updaters = []
+
+        for url, parsed in parsed_by_url.items():
+            existing_url = existing_urls.get(url)
+            episode = episodes.get(existing_url.object_id) if existing_url else None
+
+            if episode is None:
+                episode = Episode(podcast=self.podcast, id=uuid.uuid1())
+                new_episodes.append(episode)
+
+                if existing_url:
+                    # the URL exists, but its episode does not anymore
+                    existing_url.object_id = episode.pk
+                    reassigned_urls.append(existing_url)
+                    episode_urls = [existing_url]
+
+                else:
+                    new_url = URL(url=url, order=0, scope=scope, content_object=episode)
+                    new_urls.append(new_url)
+                    existing_urls[url] = new_url
+                    episode_urls = [new_url]
+
+            else:
+                episode_urls = list(episode.urls.all())
+
+            updater = EpisodeUpdater(episode, self.podcast, url)
+
+            if not updater.has_changed(parsed):
+                self.update_result.episodes_unchanged += 1
+                self.updated_episodes.append(episode)
+                continue
+
+            updater.apply_parsed(parsed)
+            updaters.append(updater)
+
+            # add the episode's missing URLs
+            next_order = max([-1] + [u.order for u in episode_urls]) + 1
+            for episode_url in get_parsed_urls(parsed):
+                if episode_url in existing_urls:
+                    continue
+
+                if len(episode_url) > URL._meta.get_field("url").max_length:
+                    logger.warning("Could not add URL: too long")
+                    continue
+
+                new_url = URL(
+                    url=episode_url,
+                    order=next_order,
+                    scope=scope,
+                    content_object=episode,
+                )
+                new_urls.append(new_url)
+                existing_urls[episode_url] = new_url
+                next_order += 1
+
+        logger.info("Creating %d new episodes", len(new_episodes))
+        Episode.objects.bulk_create(new_episodes)
+
+        if reassigned_urls:
+            URL.objects.bulk_update(reassigned_urls, ["object_id"])
+
+        URL.objects.bulk_create(new_urls)
+
+        # Keep episode_count up to date, see
+        # EpisodeManager.get_or_create_for_url; like there, episodes that
+        # only replace the missing episode of an existing URL are not counted
+        num_counted = len(new_episodes) - len(reassigned_urls)
+        if num_counted:
+            Podcast.objects.filter(pk=self.podcast.pk).update(
+                episode_count=F("episode_count") + num_counted
+            )
+
+        self.update_result.episodes_added += len(new_episodes)
+
+        new_ids = {episode.pk for episode in new_episodes}
+        existing_episodes = [
+            updater.episode for updater in updaters if updater.episode.pk not in new_ids
+        ]
+        logger.info("Updating %d existing episodes", len(existing_episodes))
+        Episode.objects.bulk_update(existing_episodes, EpisodeUpdater.UPDATED_FIELDS)
+
+        self.updated_episodes.extend(updater.episode for updater in updaters)
+        self.episodes_changed += len(updaters)
+
+    def _update_episodes_individually(self, parsed_episodes):
+        for n, parsed in enumerate(parsed_episodes, 1):
 
             url = self.get_episode_url(parsed)
             if not url:
@@ -357,25 +705,19 @@ class MultiEpisodeUpdater(object):
                 self.update_result.episodes_added += 1
 
             updater = EpisodeUpdater(episode, self.podcast)
-            updater.update_episode(parsed)
+            if updater.update_episode(parsed):
+                self.episodes_changed += 1
+            else:
+                self.update_result.episodes_unchanged += 1
 
             self.updated_episodes.append(episode)
 
-        # and mark the remaining ones outdated
-        current_episodes = Episode.objects.filter(podcast=self.podcast, outdated=False)[
-            :500
-        ]
-        outdated_episodes = set(current_episodes) - set(self.updated_episodes)
-
-        logger.info("Marking %d episodes as outdated", len(outdated_episodes))
-        for episode in outdated_episodes:
-            updater = EpisodeUpdater(episode, self.podcast)
-            updater.mark_outdated()
-
-    @transaction.atomic
     def order_episodes(self):
         """Reorder the podcast's episode according to release timestamp
 
+        The new order is calculated by the database in a single statement,
+        only the episodes whose order changes are written.
+
         Returns the highest order value (corresponding to the most recent
         episode)"""
 
@@ -383,27 +725,30 @@ class MultiEpisodeUpdater(object):
         if not num_episodes:
             return 0
 
-        episodes = (
-            self.podcast.episode_set.all()
-            .extra(select={"has_released": "released IS NOT NULL"})
-            .order_by("-has_released", "-released", "pk")
-            .only("pk")
+        # assign ``order`` from higher (most recent) to 0 (oldest)
+        # None means "unknown"
+        episode_table = connection.ops.quote_name(Episode._meta.db_table)
+        REORDER = """
+            UPDATE {episode} AS e
+            SET "order" = o.new_order
+            FROM (
+                SELECT id, %s - ROW_NUMBER() OVER (
+                    ORDER BY released IS NOT NULL DESC, released DESC, id
+                ) AS new_order
+                FROM {episode}
+                WHERE podcast_id = %s
+            ) AS o
+            WHERE e.id = o.id AND e."order" IS DISTINCT FROM o.new_order
+        """.format(
+            episode=episode_table
         )
 
-        for n, episode in enumerate(episodes.iterator(), 1):
-            # assign ``order`` from higher (most recent) to 0 (oldest)
-            # None means "unknown"
-            new_order = num_episodes - n
-
-            # optimize for new episodes that are newer than all existing
-            if episode.order == new_order:
-                continue
-
-            logger.info("Updating order from {} to {}".format(episode.order, new_order))
-            episode.order = new_order
-            episode.save()
+        with connection.cursor() as cursor:
+            cursor.execute(REORDER, [num_episodes, self.podcast.pk])
+            logger.info("Updated order of %d episodes", cursor.rowcount)
 
         self.max_episode_order = num_episodes - 1
+        return self.max_episode_order
 
     def get_episode_url(self, parsed_episode):
         """returns the URL of a parsed episode"""
@@ -415,26 +760,41 @@ class MultiEpisodeUpdater(object):
     def count_episodes(self):
         return Episode.objects.filter(podcast=self.podcast).count()
 
-    def get_update_interval(self, episodes):
-        """calculates the avg interval between new episodes"""
+    def update_release_stats(self):
+        """updates the release statistics of the podcast with new episodes
 
-        count = episodes.count()
-        if not count:
+        Only episodes that have been released after the latest known one are
+        considered, so the episodes of the podcast don't have to be queried."""
+        latest = self.podcast.latest_episode_timestamp
+        now = datetime.utcnow()
+
+        releases = sorted(
+            episode.released
+            for episode in self.updated_episodes
+            if episode.released
+            and episode.released <= now
+            and (latest is None or episode.released > latest)
+        )
+
+        for released in releases:
+            self.podcast.add_release(released)
+
+    def get_update_interval(self):
+        """estimates the interval between new episodes
+
+        The estimate is a moving average of the intervals between releases,
+        in which recent releases are weighted more."""
+
+        interval = self.podcast.release_interval
+        if interval is None:
             logger.info(
-                "no episodes, using default interval of %dh", DEFAULT_UPDATE_INTERVAL
+                "no release interval, using default interval of %dh",
+                DEFAULT_UPDATE_INTERVAL,
             )
             return DEFAULT_UPDATE_INTERVAL
 
-        earliest = episodes.first()
-        now = datetime.utcnow()
-
-        timespan_s = (now - earliest.released).total_seconds()
-        timespan_h = timespan_s / 60 / 60
-
-        interval = int(timespan_h / count)
-        logger.info(
-            "%d episodes in %d days => %dh interval", count, timespan_h / 24, interval
-        )
+        interval = int(interval)
+        logger.info("%d releases => %dh interval", self.podcast.release_count, interval)
 
         # place interval between {MIN,MAX}_UPDATE_INTERVAL
         interval = max(interval, MIN_UPDATE_INTERVAL)
@@ -443,8 +803,44 @@ class MultiEpisodeUpdater(object):
         return interval
 
     def assign_missing_episode_slugs(self):
+        """assigns slugs to all episodes that don't have one yet
+
+        Collisions with existing slugs are resolved in memory, and all new
+        slugs are inserted at once."""
         common_title = self.podcast.get_common_episode_title()
 
+        episodes = list(
+            Episode.objects.filter(
+                podcast=self.podcast, slugs__isnull=True
+            ).prefetch_related("slugs")
+        )
+        if not episodes:
+            return
+
+        scope = self.podcast.as_scope
+        used_slugs = set(
+            Slug.objects.filter(scope=scope).values_list("slug", flat=True)
+        )
+        generators = [EpisodeSlugs(episode, common_title) for episode in episodes]
+        slugs = pick_unused_slugs(generators, used_slugs)
+
+        new_slugs = [
+            Slug(slug=slug, scope=scope, content_object=episode, order=0)
+            for episode, slug in zip(episodes, slugs)
+            if slug is not None
+        ]
+
+        try:
+            with transaction.atomic():
+                Slug.objects.bulk_create(new_slugs)
+
+        except IntegrityError:
+            # some slugs have been created concurrently, eg by a
+            # pubsub-triggered update; start over one episode at a time
+            logger.warning("Bulk creation of episode slugs failed", exc_info=True)
+            self._assign_missing_episode_slugs_individually(common_title)
+
+    def _assign_missing_episode_slugs_individually(self, common_title):
         episodes = Episode.objects.filter(podcast=self.podcast, slugs__isnull=True)
 
         for episode in episodes:
@@ -455,22 +851,61 @@ class MultiEpisodeUpdater(object):
                         episode.set_slug(slug)
                     break
 
-                except:
+                except IntegrityError:
                     continue
 
 
 class EpisodeUpdater(object):
     """Updates an individual episode"""
 
-    def __init__(self, episode, podcast):
+    # the fields that are set from the parsed episode
+    UPDATED_FIELDS = [
+        "guid",
+        "description",
+        "subtitle",
+        "content",
+        "link",
+        "released",
+        "author",
+        "duration",
+        "filesize",
+        "language",
+        "mimetypes",
+        "flattr_url",
+        "license",
+        "title",
+        "last_update",
+        "modified",
+        "content_fingerprint",
+    ]
+
+    def __init__(self, episode, podcast, url=None):
         self.episode = episode
         self.podcast = podcast
 
+        # the (primary) URL of the episode; looked up if not provided
+        self.url = url
+
     def update_episode(self, parsed_episode):
-        """updates "episode" with the data from "parsed_episode" """
+        """updates "episode" with the data from "parsed_episode"
+
+        Returns False if the episode has not changed and was not updated"""
+
+        if not self.has_changed(parsed_episode):
+            return False
+
+        self.apply_parsed(parsed_episode)
+        self.episode.save()
+        self.episode.add_missing_urls(get_parsed_urls(parsed_episode))
+        return True
+
+    def has_changed(self, parsed_episode):
+        """checks if "parsed_episode" differs from the last update"""
+        return self.episode.content_fingerprint != get_fingerprint(parsed_episode)
+
+    def apply_parsed(self, parsed_episode):
+        """sets the data from "parsed_episode" without saving the episode"""
 
-        # TODO: check if there have been any changes, to
-        # avoid unnecessary updates
         self.episode.guid = to_maxlength(
             Episode, "guid", parsed_episode.get("guid") or self.episode.guid
         )
@@ -527,27 +962,37 @@ class EpisodeUpdater(object):
             "title",
             parsed_episode.get("title")
             or self.episode.title
-            or file_basename_no_extension(self.episode.url),
+            or file_basename_no_extension(self.url or self.episode.url),
         )
 
+        self.episode.content_fingerprint = get_fingerprint(parsed_episode)
         self.episode.last_update = datetime.utcnow()
-        self.episode.save()
+        self.episode.modified = self.episode.last_update
 
-        parsed_urls = list(
-            chain.from_iterable(
-                f.get("urls", []) for f in parsed_episode.get("files", [])
-            )
-        )
-        self.episode.add_missing_urls(parsed_urls)
 
-    def mark_outdated(self):
-        """marks the episode outdated if its not already"""
-        if self.episode.outdated:
-            return None
+def get_fingerprint(parsed):
+    """returns a fingerprint of parsed feed-service data
 
-        self.episode.outdated = True
-        self.episode.last_update = datetime.utcnow()
-        self.episode.save()
+    >>> get_fingerprint({'title': 'a', 'link': 'b'})
+    '0ed4388f5d7824cec26a9bbae3e155bf0238c6d6'
+    """
+    data = json.dumps(parsed, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def get_podcast_fingerprint(parsed):
+    """returns a fingerprint of the podcast-level data of a parsed podcast
+
+    Episodes are not included, they have their own fingerprints."""
+    podcast_data = {key: value for key, value in parsed.items() if key != "episodes"}
+    return get_fingerprint(podcast_data)
+
+
+def get_parsed_urls(parsed_episode):
+    """returns all URLs of a parsed episode"""
+    return list(
+        chain.from_iterable(f.get("urls", []) for f in parsed_episode.get("files", []))
+    )
 
 
 def file_basename_no_extension(filename):
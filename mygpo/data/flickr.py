@@ -4,6 +4,8 @@ import requests
 
 from django.conf import settings
 
+from mygpo import httpclient
+
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,7 +30,7 @@ def get_photo_sizes(photo_id):
     url = GET_SIZES_TEMPLATE.format(api_key=api_key, photo_id=photo_id)
 
     try:
-        resp = requests.get(url)
+        resp = httpclient.get(url)
     except requests.exceptions.RequestException as e:
         logger.warning("Retrieving Flickr photo sizes failed: %s", str(e))
         return []
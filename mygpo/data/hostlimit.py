@@ -0,0 +1,80 @@
+"""Limits concurrent feed updates per host
+
+The running updates of each host are counted in the cache, so the limit
+applies to all workers that share the cache backend. In addition, a minimum
+interval between the start of two updates for the same host can be
+configured. Updates of busy hosts are skipped instead of waiting, so that
+workers are not blocked.
+"""
+
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from mygpo.utils import get_domain
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# counters expire after this time (in seconds) without a new update, so
+# that slots of crashed workers are eventually released
+SLOT_TIMEOUT = 10 * 60
+
+
+class HostBusy(Exception):
+    """raised if no update slot for a host is available"""
+
+
+@contextmanager
+def host_slot(url):
+    """Holds an update slot for the host of ``url``
+
+    Raises HostBusy if no slot is available."""
+    host = get_domain(url)
+    key = "feed-update-host-%s" % hashlib.sha1(host.encode("utf-8")).hexdigest()
+
+    if not _acquire(key):
+        raise HostBusy(host)
+
+    try:
+        yield
+
+    finally:
+        _release(key)
+
+
+def _acquire(key):
+    cache.add(key, 0, SLOT_TIMEOUT)
+
+    try:
+        running = cache.incr(key)
+    except ValueError:
+        # the counter has expired in the meantime
+        return False
+
+    # incr() does not extend the timeout; without this, the counter could
+    # expire while slots are held under steady load
+    cache.touch(key, SLOT_TIMEOUT)
+
+    if running > settings.FEED_UPDATE_HOST_CONCURRENCY:
+        _release(key)
+        return False
+
+    interval = settings.FEED_UPDATE_HOST_INTERVAL
+    if interval and not cache.add(key + "-started", True, interval):
+        # another update for the host has been started too recently
+        _release(key)
+        return False
+
+    return True
+
+
+def _release(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        logger.warning("Update slot counter %s has expired", key)
@@ -1,7 +1,9 @@
+import time
 from itertools import islice
 
+from mygpo import httpclient
 from mygpo.maintenance.management.podcastcmd import PodcastCommand
-from mygpo.data.feeddownloader import update_podcasts
+from mygpo.data.feeddownloader import update_podcasts, update_podcasts_concurrently
 
 import socket
 
@@ -24,6 +26,15 @@ class Command(PodcastCommand):
             help="Don't update anything, just list podcasts ",
         ),
 
+        parser.add_argument(
+            "--workers",
+            action="store",
+            dest="workers",
+            type=int,
+            default=1,
+            help="Number of podcasts to update concurrently",
+        ),
+
     def handle(self, *args, **options):
 
         queue = self.get_podcasts(*args, **options)
@@ -39,5 +50,31 @@ class Command(PodcastCommand):
         else:
             logger.info("Updating podcasts...")
 
-            for podcast in update_podcasts(queue):
-                logger.info("Updated podcast %s", podcast)
+            workers = options.get("workers")
+            if workers > 1:
+                updates = update_podcasts_concurrently(queue, workers)
+            else:
+                updates = update_podcasts(queue)
+
+            start = time.monotonic()
+            num_updated = 0
+            num_skipped = 0
+
+            # updates that were skipped or did not yield a podcast are
+            # reported as None; they don't count towards the throughput
+            for podcast in updates:
+                if podcast:
+                    num_updated += 1
+                    logger.info("Updated podcast %s", podcast)
+                else:
+                    num_skipped += 1
+
+            duration = time.monotonic() - start
+            logger.info(
+                "Updated %d podcasts in %.1fs (%.1f feeds/minute), skipped %d",
+                num_updated,
+                duration,
+                num_updated / duration * 60 if duration else 0,
+                num_skipped,
+            )
+            httpclient.log_stats()
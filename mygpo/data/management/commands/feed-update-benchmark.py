@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+
+from mygpo.data.benchmark import run_benchmark, format_results
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the feed update pipeline
+
+    Recorded (or synthetic) feed-service responses are replayed through a
+    local stub of the feed-service. Reports wall time, feeds per second, and
+    the number of queries and duration of each update phase. All database
+    changes are rolled back.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corpus",
+            action="store",
+            dest="corpus",
+            default=None,
+            help="Directory with recorded feed-service responses (*.json)",
+        )
+
+        parser.add_argument(
+            "--feeds",
+            action="store",
+            dest="feeds",
+            type=int,
+            default=50,
+            help="Number of synthetic feeds (if no corpus is given)",
+        )
+
+        parser.add_argument(
+            "--episodes",
+            action="store",
+            dest="episodes",
+            type=int,
+            default=20,
+            help="Number of episodes per synthetic feed",
+        )
+
+        parser.add_argument(
+            "--large-feeds",
+            action="store",
+            dest="large_feeds",
+            type=int,
+            default=5,
+            help="Number of large feeds",
+        )
+
+        parser.add_argument(
+            "--large-episodes",
+            action="store",
+            dest="large_episodes",
+            type=int,
+            default=2000,
+            help="Number of episodes per large feed",
+        )
+
+    def handle(self, *args, **options):
+        results = run_benchmark(
+            num_feeds=options["feeds"],
+            num_episodes=options["episodes"],
+            num_large=options["large_feeds"],
+            large_episodes=options["large_episodes"],
+            corpus_path=options["corpus"],
+        )
+        self.stdout.write(format_results(results))
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data", "0003_podcastupdateresult_podcast_url"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcastupdateresult",
+            name="episodes_unchanged",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="podcastupdateresult",
+            name="podcast_unchanged",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data", "0004_content_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcastupdateresult",
+            name="episodes_outdated",
+            field=models.IntegerField(default=0),
+        ),
+    ]
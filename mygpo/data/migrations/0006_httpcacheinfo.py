@@ -0,0 +1,43 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data", "0005_podcastupdateresult_episodes_outdated"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HTTPCacheInfo",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                ("url_hash", models.CharField(max_length=40, unique=True)),
+                ("url", models.URLField(max_length=2048)),
+                ("etag", models.CharField(blank=True, max_length=1000)),
+                ("last_modified", models.CharField(blank=True, max_length=100)),
+                ("content_hash", models.CharField(blank=True, max_length=40)),
+            ],
+            options={
+                "verbose_name": "HTTP Cache Info",
+                "verbose_name_plural": "HTTP Cache Infos",
+            },
+        ),
+        migrations.AddField(
+            model_name="podcastupdateresult",
+            name="not_modified",
+            field=models.BooleanField(default=False),
+        ),
+    ]
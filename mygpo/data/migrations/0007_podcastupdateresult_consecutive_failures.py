@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data", "0006_httpcacheinfo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcastupdateresult",
+            name="consecutive_failures",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data", "0007_podcastupdateresult_consecutive_failures"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcastupdateresult",
+            name="phase_durations",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
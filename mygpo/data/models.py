@@ -1,13 +1,49 @@
+import time
 import uuid
-
-from datetime import datetime
+import threading
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Greatest
 
-from mygpo.core.models import UUIDModel
+from mygpo.core.models import UUIDModel, UpdateInfoModel
 from mygpo.podcasts.models import Podcast
 
 
+# the next update of a failing podcast is delayed by this duration, doubled
+# for every further consecutive failure
+FAILURE_BACKOFF = timedelta(hours=6)
+
+# maximum delay of the next update of a failing podcast
+MAX_FAILURE_BACKOFF = timedelta(days=90)
+
+
+# the phases of a podcast update for which durations are recorded
+UPDATE_PHASES = [
+    "fetch",
+    "parse",
+    "episodes",
+    "order",
+    "categories",
+    "logo",
+    "save",
+    "slugs",
+    "hub",
+]
+
+
+# the phase of the update that is currently running in the thread
+_running = threading.local()
+
+
+def get_running_phase():
+    """Returns the update phase that is currently running in this thread"""
+    return getattr(_running, "phase", None)
+
+
 class PodcastUpdateResult(UUIDModel):
     """Results of a podcast update
 
@@ -37,6 +73,28 @@ class PodcastUpdateResult(UUIDModel):
     # The number of episodes that were created by the update
     episodes_added = models.IntegerField()
 
+    # A flag indicating whether the feed was not processed at all because it
+    # had not been modified since the previous update
+    not_modified = models.BooleanField(default=False)
+
+    # The number of episodes that were marked as outdated by the update
+    episodes_outdated = models.IntegerField(default=0)
+
+    # The number of episodes that were not written because they did not change
+    episodes_unchanged = models.IntegerField(default=0)
+
+    # A flag indicating whether writing the podcast was skipped because it did
+    # not change
+    podcast_unchanged = models.BooleanField(default=False)
+
+    # The number of failed updates of the podcast up to and including this
+    # one since its last successful update
+    consecutive_failures = models.PositiveIntegerField(default=0)
+
+    # The durations (in seconds) of the individual phases of the update, see
+    # UPDATE_PHASES. Phases that were not executed are missing.
+    phase_durations = models.JSONField(default=dict, blank=True)
+
     class Meta(object):
 
         get_latest_by = "start"
@@ -61,7 +119,7 @@ class PodcastUpdateResult(UUIDModel):
         self.duration = datetime.utcnow() - self.start
 
         success = (exc_type, exc_value, traceback) == (None, None, None)
-        self.successful = success
+        self.successful = success and not self.error_message
 
         if not success:
             self.error_message = str(exc_value)
@@ -72,4 +130,133 @@ class PodcastUpdateResult(UUIDModel):
             if self.episodes_added is None:
                 self.episodes_added = 0
 
+        self.consecutive_failures = self._count_consecutive_failures()
         self.save()
+
+        if self.consecutive_failures:
+            self._back_off()
+
+    @contextmanager
+    def timer(self, phase):
+        """Adds the duration of the enclosed code to the phase's duration"""
+        previous_phase = getattr(_running, "phase", None)
+        _running.phase = phase
+        start = time.monotonic()
+        try:
+            yield
+
+        finally:
+            duration = time.monotonic() - start
+            self.phase_durations[phase] = self.phase_durations.get(phase, 0) + duration
+            _running.phase = previous_phase
+
+    def _count_consecutive_failures(self):
+        if self.successful or self.podcast_id is None:
+            return 0
+
+        previous = (
+            PodcastUpdateResult.objects.filter(podcast_id=self.podcast_id)
+            .only("consecutive_failures")
+            .first()
+        )
+        return (previous.consecutive_failures if previous else 0) + 1
+
+    def _back_off(self):
+        """Delays the next update of the podcast exponentially"""
+        # limit the exponent, MAX_FAILURE_BACKOFF is reached long before
+        exponent = min(self.consecutive_failures - 1, 20)
+        backoff = FAILURE_BACKOFF * 2**exponent
+        backoff_until = self.start + min(backoff, MAX_FAILURE_BACKOFF)
+
+        # the backoff is stored separately so that it survives later saves of
+        # the podcast; the update is only ever delayed, never brought forward
+        Podcast.objects.filter(pk=self.podcast_id).update(
+            backoff_until=backoff_until,
+            next_update=Greatest("next_update", Value(backoff_until)),
+        )
+
+
+def _sha1(value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.sha1(value).hexdigest()
+
+
+class HTTPCacheInfoManager(models.Manager):
+    def for_url(self, url):
+        """Returns the cache information for the URL
+
+        If nothing is known about the URL yet, an unsaved instance is
+        returned."""
+        url_hash = _sha1(url)
+        try:
+            return self.get(url_hash=url_hash)
+        except self.model.DoesNotExist:
+            return self.model(url_hash=url_hash, url=url)
+
+
+class HTTPCacheInfo(UpdateInfoModel):
+    """Validators of a previously fetched HTTP resource (eg a feed or logo)
+
+    They are used to send conditional requests and to detect if a resource
+    has changed since it was last fetched."""
+
+    # SHA1 hash of the URL; the URL itself could be too long for an index
+    url_hash = models.CharField(max_length=40, unique=True)
+
+    # URL of the resource
+    url = models.URLField(max_length=2048)
+
+    # value of the ETag header of the last response
+    etag = models.CharField(max_length=1000, blank=True)
+
+    # value of the Last-Modified header of the last response
+    last_modified = models.CharField(max_length=100, blank=True)
+
+    # SHA1 hash of the body of the last response
+    content_hash = models.CharField(max_length=40, blank=True)
+
+    objects = HTTPCacheInfoManager()
+
+    class Meta:
+        verbose_name = "HTTP Cache Info"
+        verbose_name_plural = "HTTP Cache Infos"
+
+    def __str__(self):
+        return self.url
+
+    def get_request_headers(self):
+        """Returns the headers for a conditional request"""
+        headers = {}
+
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+    def is_unchanged(self, response):
+        """Checks if the response indicates that the resource is unchanged
+
+        This is the case if the server replied "304 Not Modified", or if
+        the content is identical to the one of the previous response."""
+        if response.status_code == 304:
+            return True
+
+        return bool(self.content_hash) and self.content_hash == _sha1(response.content)
+
+    def set_from_response(self, response, content_hash=None):
+        """Sets the validators from the response, without saving
+
+        The hash of the content can be given if the response has been
+        streamed and its content is not available anymore."""
+        etag_len = self._meta.get_field("etag").max_length
+        last_modified_len = self._meta.get_field("last_modified").max_length
+
+        self.etag = response.headers.get("ETag", "")[:etag_len]
+        self.last_modified = response.headers.get("Last-Modified", "")[
+            :last_modified_len
+        ]
+        self.content_hash = content_hash or _sha1(response.content)
@@ -0,0 +1,87 @@
+"""Coalesces update notifications of PubSubHubbub hubs
+
+Hubs can send several notifications for the same feed within a short time.
+When a notification is received, a pending marker is set for the feed and an
+update is queued after a short delay. Notifications that arrive while an
+update of the feed is queued or running are dropped, as that update will pick
+up their changes anyway.
+
+The markers and counters are kept in the cache, so they are shared by all
+processes that use the same cache backend. With a cache that is local to
+each process, the marker set by the web process could never be cleared by
+the worker that runs the update, so notifications are not coalesced then.
+"""
+
+import hashlib
+from contextlib import contextmanager
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# pending markers expire after this time (in seconds), so that a lost task
+# does not block updates of the feed forever
+PENDING_TIMEOUT = 30 * 60
+
+# cache keys of the counters
+PINGS_RECEIVED = "pubsub-pings-received"
+UPDATES_EXECUTED = "pubsub-updates-executed"
+
+
+def add_pending(feed_url):
+    """Records a notification for ``feed_url``
+
+    Returns True if an update should be queued, or False if an update is
+    already queued or running."""
+    _count(PINGS_RECEIVED)
+
+    if not is_shared_cache():
+        return True
+
+    return cache.add(_pending_key(feed_url), True, PENDING_TIMEOUT)
+
+
+@contextmanager
+def pending_update(feed_url):
+    """Marks the execution of a queued update for ``feed_url``
+
+    Notifications are dropped until the update has finished."""
+    _count(UPDATES_EXECUTED)
+
+    try:
+        yield
+
+    finally:
+        cache.delete(_pending_key(feed_url))
+
+
+def is_shared_cache():
+    """Returns if the cache backend can be shared by several processes"""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def get_stats():
+    """Returns the number of received notifications and executed updates"""
+    counts = cache.get_many([PINGS_RECEIVED, UPDATES_EXECUTED])
+    return {
+        "pings_received": counts.get(PINGS_RECEIVED, 0),
+        "updates_executed": counts.get(UPDATES_EXECUTED, 0),
+    }
+
+
+def _pending_key(feed_url):
+    return "pubsub-pending-%s" % hashlib.sha1(feed_url.encode("utf-8")).hexdigest()
+
+
+def _count(key):
+    cache.add(key, 0, None)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        logger.warning("Counter %s has been evicted", key)
@@ -0,0 +1,351 @@
+"""Parser backends that turn podcast feeds into the data used for updates
+
+A backend is selected with the FEED_PARSER setting. Its ``parse`` method
+returns the parsed podcast as a dict, in the format of the feed-service, or
+None if the feed could not be parsed. FeedNotModified is raised if the feed
+has not changed since the last update.
+"""
+
+import hashlib
+import calendar
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+
+import html2text
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from mygpo import httpclient
+from mygpo.utils import parse_time
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FeedNotModified(Exception):
+    """raised when a feed has not been modified since its last update"""
+
+    def __init__(self, podcast=None):
+        super().__init__(podcast)
+        self.podcast = podcast
+
+
+def get_parser(max_episodes):
+    """Returns an instance of the configured parser backend"""
+    parser_cls = import_string(settings.FEED_PARSER)
+    return parser_cls(max_episodes)
+
+
+class FeedServiceParser(object):
+    """Parses feeds using the feed-service at FEEDSERVICE_URL"""
+
+    def __init__(self, max_episodes):
+        # episodes are limited by the caller
+        self.max_episodes = max_episodes
+
+    def parse(self, feed_url, cache_info=None):
+        """fetches the parsed feed from the feed-service
+
+        If cache information from a previous update is given, a conditional
+        request is sent, and FeedNotModified is raised if the feed has not
+        changed. Otherwise the cache information is set from the response."""
+
+        # only validators of a completed update can be used
+        conditional = cache_info is not None and cache_info.pk is not None
+
+        params = {"url": feed_url, "process_text": "markdown"}
+        headers = {"Accept": "application/json"}
+        if conditional:
+            headers.update(cache_info.get_request_headers())
+
+        url = urljoin(settings.FEEDSERVICE_URL, "parse")
+        r = httpclient.get(url, params=params, headers=headers, timeout=30)
+
+        if conditional and cache_info.is_unchanged(r):
+            logger.info('Feed "%s" has not been modified', feed_url)
+            raise FeedNotModified()
+
+        if r.status_code != 200:
+            logger.error(
+                'Feed-service status code for "{}" was {}'.format(url, r.status_code)
+            )
+            return None
+
+        if cache_info is not None:
+            cache_info.set_from_response(r)
+
+        try:
+            return r.json()[0]
+        except ValueError:
+            logger.exception(
+                'Feed-service error while parsing response for url "%s": %s',
+                feed_url,
+                r.text,
+            )
+            raise
+
+
+ITUNES = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+ATOM = "{http://www.w3.org/2005/Atom}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+# elements that contain the podcast (RSS) or are the podcast (Atom)
+CHANNEL_TAGS = {"channel", ATOM + "feed"}
+
+# elements that contain an episode
+ITEM_TAGS = {"item", ATOM + "entry"}
+
+# size of the chunks in which the feed is read
+CHUNK_SIZE = 16 * 1024
+
+
+class StreamingFeedParser(object):
+    """Fetches and parses RSS and Atom feeds in-process
+
+    The feed is parsed incrementally while it is downloaded. Episodes are
+    discarded from the XML tree as soon as they have been parsed, and
+    reading stops after ``max_episodes`` episodes, so the memory used does
+    not depend on the size of the feed."""
+
+    def __init__(self, max_episodes):
+        self.max_episodes = max_episodes
+
+    def parse(self, feed_url, cache_info=None):
+        """fetches and parses the feed
+
+        Conditional requests are sent if cache information from a previous
+        update is given. As the feed may not be read completely, its content
+        hash only covers the part that has been parsed."""
+
+        # only validators of a completed update can be used
+        conditional = cache_info is not None and cache_info.pk is not None
+
+        headers = {}
+        if conditional:
+            headers.update(cache_info.get_request_headers())
+
+        with httpclient.get(feed_url, headers=headers, stream=True) as r:
+
+            if conditional and r.status_code == 304:
+                logger.info('Feed "%s" has not been modified', feed_url)
+                raise FeedNotModified()
+
+            if r.status_code != 200:
+                logger.error('Status code for "%s" was %d', feed_url, r.status_code)
+                return None
+
+            content_hash = hashlib.sha1()
+            try:
+                channel, episodes = self._parse_stream(r, content_hash)
+
+            except ElementTree.ParseError:
+                logger.warning('Could not parse feed "%s"', feed_url, exc_info=True)
+                return None
+
+            feed_urls = [feed_url, r.url] if r.url != feed_url else [feed_url]
+
+        content_hash = content_hash.hexdigest()
+        if conditional and cache_info.content_hash == content_hash:
+            logger.info('Feed "%s" has not been modified', feed_url)
+            raise FeedNotModified()
+
+        if cache_info is not None:
+            cache_info.set_from_response(r, content_hash)
+
+        if channel is None:
+            return None
+
+        return self._parse_podcast(channel, episodes, feed_urls)
+
+    def _parse_stream(self, response, content_hash):
+        """parses the feed, returns its channel element and the episodes"""
+        parser = ElementTree.XMLPullParser(events=("start", "end"))
+        channel = None
+        episodes = []
+
+        for chunk in response.iter_content(CHUNK_SIZE):
+            content_hash.update(chunk)
+            parser.feed(chunk)
+
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if elem.tag in CHANNEL_TAGS and channel is None:
+                        channel = elem
+                    continue
+
+                if elem.tag not in ITEM_TAGS or channel is None:
+                    continue
+
+                episodes.append(self._parse_episode(elem))
+
+                # the episode is not needed in the tree anymore
+                elem.clear()
+                if elem in channel:
+                    channel.remove(elem)
+
+                if len(episodes) >= self.max_episodes:
+                    return channel, episodes
+
+        parser.close()
+        return channel, episodes
+
+    def _parse_podcast(self, channel, episodes, feed_urls):
+        mimetypes = [f["mimetype"] for e in episodes for f in e["files"]]
+        content_types = {
+            mimetype.split("/")[0]
+            for mimetype in mimetypes
+            if mimetype and mimetype.split("/")[0] in ("audio", "video", "image")
+        }
+
+        return {
+            "title": _text(channel, "title", ATOM + "title"),
+            "description": _markdown(
+                _text(channel, "description", ITUNES + "summary", ATOM + "subtitle")
+            ),
+            "subtitle": _text(channel, ITUNES + "subtitle"),
+            "link": _text(channel, "link") or _link(channel, "alternate"),
+            "logo": _logo(channel),
+            "author": _author(channel),
+            "language": _text(channel, "language") or channel.get(XML_LANG),
+            "content_types": sorted(content_types),
+            "new_location": _text(channel, ITUNES + "new-feed-url"),
+            "flattr": _link(channel, "payment"),
+            "hub": _link(channel, "hub"),
+            "license": None,
+            "urls": feed_urls,
+            "episodes": episodes,
+        }
+
+    def _parse_episode(self, item):
+        return {
+            "guid": _text(item, "guid", ATOM + "id"),
+            "title": _text(item, "title", ATOM + "title"),
+            "description": _markdown(
+                _text(item, "description", ITUNES + "summary", ATOM + "summary")
+            ),
+            "subtitle": _text(item, ITUNES + "subtitle"),
+            "content": _markdown(_text(item, CONTENT + "encoded", ATOM + "content")),
+            "link": _text(item, "link") or _link(item, "alternate"),
+            "released": _timestamp(
+                _text(item, "pubDate", ATOM + "published", ATOM + "updated")
+            ),
+            "author": _author(item),
+            "duration": _duration(_text(item, ITUNES + "duration")),
+            "files": _files(item),
+            "language": None,
+            "flattr": _link(item, "payment"),
+            "license": None,
+        }
+
+
+def _text(elem, *tags):
+    """returns the stripped text of the first of the child elements found"""
+    for tag in tags:
+        child = elem.find(tag)
+        if child is not None and child.text and child.text.strip():
+            return child.text.strip()
+    return None
+
+
+def _link(elem, rel):
+    """returns the target of the first Atom link with the given relation"""
+    for link in elem.iterfind(ATOM + "link"):
+        if link.get("rel", "alternate") == rel and link.get("href"):
+            return link.get("href")
+    return None
+
+
+def _logo(channel):
+    image = channel.find(ITUNES + "image")
+    if image is not None and image.get("href"):
+        return image.get("href")
+
+    return _text(channel, "image/url", ATOM + "logo", ATOM + "icon")
+
+
+def _author(elem):
+    return _text(
+        elem,
+        ITUNES + "author",
+        "author",
+        "managingEditor",
+        ATOM + "author/" + ATOM + "name",
+    )
+
+
+def _files(item):
+    files = []
+
+    enclosures = [(e.get("url"), e) for e in item.iterfind("enclosure")]
+    enclosures += [
+        (link.get("href"), link)
+        for link in item.iterfind(ATOM + "link")
+        if link.get("rel") == "enclosure"
+    ]
+
+    for url, elem in enclosures:
+        if not url:
+            continue
+
+        try:
+            filesize = int(elem.get("length"))
+        except (TypeError, ValueError):
+            filesize = None
+
+        files.append(
+            {"urls": [url.strip()], "filesize": filesize, "mimetype": elem.get("type")}
+        )
+
+    return files
+
+
+def _markdown(html):
+    if not html:
+        return html
+    return html2text.html2text(html).strip()
+
+
+def _timestamp(value):
+    """returns the UTC timestamp of an RFC 822 (RSS) or ISO 8601 (Atom) date
+
+    >>> _timestamp('Thu, 01 Jan 1970 01:00:00 +0100')
+    0
+
+    >>> _timestamp('2017-07-14T02:40:00Z')
+    1500000000
+    """
+    if not value:
+        return None
+
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    return calendar.timegm(dt.utctimetuple())
+
+
+def _duration(value):
+    """returns the duration in seconds
+
+    >>> _duration('1:05:10')
+    3910
+
+    >>> _duration('invalid') is None
+    True
+    """
+    if not value:
+        return None
+
+    try:
+        return parse_time(value)
+    except ValueError:
+        return None
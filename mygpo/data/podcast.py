@@ -1,61 +1,132 @@
-from collections import Counter
-import random
+import math
+import heapq
 import logging
+from collections import Counter, defaultdict
+from itertools import groupby
+from operator import itemgetter
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 
 from mygpo.podcasts.models import Podcast
 from mygpo.subscriptions.models import Subscription
 from mygpo.pubsub import utils
+from mygpo.pubsub.models import HubSubscription
 
 logger = logging.getLogger(__name__)
 
 
-def calc_similar_podcasts(podcast, num=20, user_sample=100):
-    """Get a list of podcasts that seem to be similar to the given one.
+# users with more subscriptions are not considered for related podcasts;
+# they add little information, but most of the cost
+MAX_USER_SUBSCRIPTIONS = 500
 
-    The similarity is based on similar subscriptions; for performance
-    reasons, only a sample of subscribers is considered"""
+# podcasts are only related if they have at least this many common subscribers
+MIN_COMMON_SUBSCRIBERS = 2
 
-    logger.info("Calculating podcasts similar to {podcast}".format(podcast=podcast))
+# number of podcasts whose related podcasts are calculated in one pass over
+# the subscriptions; limits the memory needed for the co-subscription counts
+RELATED_CHUNK_SIZE = 10000
+
+
+def calc_related_podcasts(num=20, chunk_size=RELATED_CHUNK_SIZE):
+    """Calculates the related podcasts of all podcasts
+
+    Podcasts are related if they are subscribed by the same users. The
+    numbers of common subscribers of all pairs of podcasts are counted from
+    a sparse user x podcast matrix of the subscriptions. They are divided by
+    the geometric mean of the podcasts' subscribers (cosine similarity), so
+    that popular podcasts are not related to everything.
+
+    The subscriptions are streamed from the database once to count the
+    subscribers, and once more for every chunk of ``chunk_size`` podcasts,
+    so that they never have to be held in memory at once.
+
+    Returns a dict of podcast IDs and the IDs of their (at most) ``num`` most
+    related podcasts, most related first."""
+    subscribers = Counter()
+    num_users = 0
+    for row in _iter_subscription_rows():
+        subscribers.update(row)
+        num_users += 1
 
-    # get all users that subscribe to this podcast
-    user_ids = (
-        Subscription.objects.filter(podcast=podcast)
-        .order_by("user")
-        .distinct("user")
-        .values_list("user", flat=True)
-    )
     logger.info(
-        "Found {num_subscribers} subscribers, taking a sample "
-        "of {sample_size}".format(
-            num_subscribers=len(user_ids), sample_size=user_sample
-        )
+        "Calculating related podcasts from {users} users and {podcasts} "
+        "podcasts".format(users=num_users, podcasts=len(subscribers))
     )
 
-    # take a random sample of ``user_sample`` subscribers
-    user_ids = list(user_ids)  # evaluate ValuesQuerySet
-    random.shuffle(user_ids)
-    user_ids = user_ids[:user_sample]
-
-    # get other podcasts that the user sample subscribes to
-    podcasts = Counter()
+    podcast_ids = sorted(subscribers)
+    related = {}
+    for start in range(0, len(podcast_ids), chunk_size):
+        chunk = set(podcast_ids[start : start + chunk_size])
+
+        # the rows of the co-subscription matrix of the podcasts in the chunk
+        common = defaultdict(Counter)
+        for row in _iter_subscription_rows():
+            for podcast in row:
+                if podcast in chunk:
+                    common[podcast].update(row)
+
+        for podcast, counts in common.items():
+            del counts[podcast]
+            scores = (
+                (other, n / math.sqrt(subscribers[podcast] * subscribers[other]))
+                for other, n in counts.items()
+                if n >= MIN_COMMON_SUBSCRIBERS
+            )
+            most_related = heapq.nlargest(num, scores, key=itemgetter(1))
+            if most_related:
+                related[podcast] = [other for other, _score in most_related]
+
+    return related
+
+
+def _iter_subscription_rows():
+    """Yields the IDs of the subscribed podcasts of each user
+
+    The subscriptions are streamed ordered by user, so only the podcasts of
+    one user are held in memory at a time."""
     subscriptions = (
-        Podcast.objects.filter(subscription__user__id__in=user_ids)
-        .distinct("pk")
-        .exclude(pk=podcast.pk)
-    )
-    podcasts.update(Counter(subscriptions))
-    logger.info(
-        "Found {num_podcasts}, returning top {num_results}".format(
-            num_podcasts=len(podcasts), num_results=num
-        )
+        Subscription.objects.order_by("user")
+        .values_list("user", "podcast")
+        .distinct()
+        .iterator()
     )
 
-    return podcasts.most_common(num)
+    for _user, user_subscriptions in groupby(subscriptions, key=itemgetter(0)):
+        row = [podcast for _user, podcast in user_subscriptions]
+
+        # users with a single podcast do not relate any podcasts
+        if 1 < len(row) <= MAX_USER_SUBSCRIPTIONS:
+            yield row
+
 
+@transaction.atomic
+def store_related_podcasts(related):
+    """Replaces the related podcasts of all podcasts
 
-def subscribe_at_hub(podcast):
+    As the relation is symmetrical, podcasts can end up with more related
+    podcasts than have been calculated for them."""
+    RelatedPodcast = Podcast.related_podcasts.through
+
+    pairs = set()
+    for podcast, others in related.items():
+        for other in others:
+            pairs.add((podcast, other))
+            pairs.add((other, podcast))
+
+    RelatedPodcast.objects.all().delete()
+    RelatedPodcast.objects.bulk_create(
+        (
+            RelatedPodcast(from_podcast_id=podcast, to_podcast_id=other)
+            for podcast, other in pairs
+        ),
+        batch_size=10000,
+    )
+    return len(pairs)
+
+
+def subscribe_at_hub(podcast, renew=False):
     """Tries to subscribe to the given podcast at its hub"""
 
     if not podcast.hub:
@@ -74,4 +145,26 @@ def subscribe_at_hub(podcast):
     logger.info(
         "subscribing to {podcast} at {hub}.".format(podcast=podcast, hub=podcast.hub)
     )
-    utils.subscribe(podcast, podcast.url, podcast.hub, base_url)
+    utils.subscribe(podcast, podcast.url, podcast.hub, base_url, renew=renew)
+
+
+def podcasts_for_hub_subscription(until, retry_after):
+    """Podcasts with a hub that need a new or renewed subscription
+
+    These are podcasts without a live subscription at their current hub that
+    lasts at least ``until``. Subscriptions that have been requested after
+    ``retry_after`` are not sent again, so that failing hubs are not
+    contacted on every run."""
+    live = HubSubscription.objects.live(until).filter(
+        podcast=OuterRef("pk"), hub_url=OuterRef("hub")
+    )
+    recent = HubSubscription.objects.filter(
+        podcast=OuterRef("pk"), modified__gt=retry_after
+    )
+
+    return (
+        Podcast.objects.exclude(hub__isnull=True)
+        .exclude(hub="")
+        .filter(~Exists(live), ~Exists(recent))
+        .order_by("-subscribers")
+    )
@@ -1,14 +1,20 @@
-from operator import itemgetter
 from datetime import datetime, timedelta
 
-from django.db import IntegrityError
+from django.conf import settings
+from django.db.models import Avg
 
 from celery import shared_task
 from django_db_geventpool.utils import close_connection
 
-from mygpo.data.podcast import calc_similar_podcasts
+from mygpo.data.podcast import (
+    calc_related_podcasts,
+    store_related_podcasts,
+    subscribe_at_hub,
+    podcasts_for_hub_subscription,
+)
 from mygpo.celery import celery
 from mygpo.podcasts.models import Podcast
+from mygpo.pubsub.models import SubscriptionError
 
 from celery.utils.log import get_task_logger
 
@@ -28,26 +34,38 @@ def update_podcasts(podcast_urls):
 
 @shared_task
 @close_connection
-def update_related_podcasts(podcast_pk, max_related=20):
-    get_podcast = itemgetter(0)
+def update_notified_podcast(podcast_url):
+    """Task to update a podcast after a PubSubHubbub notification"""
+    from mygpo.data.feeddownloader import update_podcasts as update
+    from mygpo.data.notifications import pending_update
 
-    podcast = Podcast.objects.get(pk=podcast_pk)
+    with pending_update(podcast_url):
+        podcasts = filter(None, update([podcast_url]))
+        return [podcast.pk for podcast in podcasts]
 
-    related = calc_similar_podcasts(podcast)[:max_related]
-    related = map(get_podcast, related)
 
-    for p in related:
-        try:
-            podcast.related_podcasts.add(p)
-        except IntegrityError:
-            logger.warning(
-                "Integrity error while adding related podcast", exc_info=True
-            )
+@shared_task
+@close_connection
+def update_all_related_podcasts(max_related=20):
+    """Calculates the related podcasts of all podcasts at once"""
+    related = calc_related_podcasts(max_related)
+    num_pairs = store_related_podcasts(related)
+    logger.info("Stored %d related podcasts for %d podcasts", num_pairs, len(related))
 
 
 # interval in which podcast updates are scheduled
 UPDATE_INTERVAL = timedelta(hours=1)
 
+# assumed duration of a podcast update if none have been recorded yet
+DEFAULT_UPDATE_DURATION = timedelta(seconds=10)
+
+# number of recent updates from which the average duration is calculated
+UPDATE_DURATION_SAMPLES = 1000
+
+# queued podcasts are not scheduled again until this long after the end of
+# the following scheduling period, unless their update finishes before
+QUEUED_UPDATE_TIMEOUT = timedelta(hours=1)
+
 
 @shared_task
 @close_connection
@@ -55,16 +73,24 @@ def schedule_updates(interval=UPDATE_INTERVAL):
     """Schedules podcast updates that are due within ``interval``"""
     now = datetime.utcnow()
 
-    # max number of updates to schedule (one every 10s)
-    max_updates = UPDATE_INTERVAL.total_seconds() / 10
+    max_updates = get_max_updates(interval)
 
-    # fetch podcasts for which an update is due within the next hour
+    # fetch podcasts for which an update is due within the next hour,
+    # including those that are already overdue, most important first
     podcasts = (
         Podcast.objects.all()
-        .next_update_between(now, now + interval)
+        .due_for_update(now + interval)
         .prefetch_related("urls")
         .only("pk")[:max_updates]
     )
+    podcasts = list(podcasts)
+
+    # the next runs would select the same podcasts while their updates are
+    # still queued; the updates set next_update again when they finish, so
+    # the podcasts are marked before the updates are queued
+    Podcast.objects.filter(pk__in=[podcast.pk for podcast in podcasts]).update(
+        next_update=now + 2 * interval + QUEUED_UPDATE_TIMEOUT
+    )
 
     _schedule_updates(podcasts)
 
@@ -74,20 +100,81 @@ def schedule_updates(interval=UPDATE_INTERVAL):
 def schedule_updates_longest_no_update():
     """Schedule podcasts for update that have not been updated for longest"""
 
-    # max number of updates to schedule (one every 20s)
-    max_updates = UPDATE_INTERVAL.total_seconds() / 10
+    max_updates = get_max_updates(UPDATE_INTERVAL)
 
     podcasts = Podcast.objects.order_by("last_update")[:max_updates]
     _schedule_updates(podcasts)
 
 
+def get_max_updates(interval):
+    """Number of podcast updates the workers can process within ``interval``"""
+    duration = get_avg_update_duration()
+    return int(interval / duration * settings.FEED_UPDATE_WORKERS)
+
+
+def get_avg_update_duration():
+    """Average duration of the most recent successful podcast updates"""
+    from mygpo.data.models import PodcastUpdateResult
+
+    results = PodcastUpdateResult.objects.filter(successful=True).order_by("-start")
+    avg = results[:UPDATE_DURATION_SAMPLES].aggregate(avg=Avg("duration"))["avg"]
+    return avg or DEFAULT_UPDATE_DURATION
+
+
 def _schedule_updates(podcasts):
-    """Schedule updates for podcasts"""
+    """Schedule updates for podcasts
+
+    The URLs of several podcasts are sent in one task to reduce the number of
+    messages that have to pass through the broker."""
     logger.info("Scheduling %d podcasts for update", len(podcasts))
 
+    batch_size = settings.FEED_UPDATE_BATCH_SIZE
+    urls = [podcast.url for podcast in podcasts if podcast.url]
+
     # queue all those podcast updates
-    for podcast in podcasts:
+    for n in range(0, len(urls), batch_size):
         # update_podcasts.delay() seems to block other task execution,
         # therefore celery.send_task() is used instead
-        urls = [podcast.url]
-        celery.send_task("mygpo.data.tasks.update_podcasts", args=[urls])
+        batch = urls[n : n + batch_size]
+        celery.send_task("mygpo.data.tasks.update_podcasts", args=[batch])
+
+
+# subscriptions are renewed when their lease expires within this time
+HUB_RENEWAL_MARGIN = timedelta(days=3)
+
+# failed subscription requests are retried after this time
+HUB_RETRY_INTERVAL = timedelta(hours=12)
+
+
+@shared_task
+@close_connection
+def subscribe_podcast_at_hub(podcast_pk, renew=False):
+    """Task to subscribe to a podcast at its hub"""
+    podcast = Podcast.objects.get(pk=podcast_pk)
+
+    try:
+        subscribe_at_hub(podcast, renew=renew)
+    except SubscriptionError as se:
+        logger.warning("subscribing to hub failed: %s", str(se))
+
+
+@shared_task
+@close_connection
+def renew_hub_subscriptions():
+    """Subscribes to podcasts at their hubs before the subscriptions expire
+
+    One batch of at most PUBSUB_RENEWAL_BATCH_SIZE subscriptions is sent per
+    run, podcasts with more subscribers first."""
+    now = datetime.utcnow()
+    podcasts = podcasts_for_hub_subscription(
+        until=now + HUB_RENEWAL_MARGIN, retry_after=now - HUB_RETRY_INTERVAL
+    )
+    podcasts = podcasts.prefetch_related("urls")[: settings.PUBSUB_RENEWAL_BATCH_SIZE]
+
+    logger.info("Renewing %d hub subscriptions", len(podcasts))
+
+    for podcast in podcasts:
+        try:
+            subscribe_at_hub(podcast, renew=True)
+        except SubscriptionError as se:
+            logger.warning("subscribing to hub failed: %s", str(se))
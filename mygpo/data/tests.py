@@ -1,9 +1,37 @@
 import re
 import json
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from . import flickr
+from mygpo import httpclient
+from mygpo.podcasts.models import Podcast, Episode, URL
+from mygpo.pubsub.models import HubSubscription
+from mygpo.subscriptions.models import Subscription
+from mygpo.users.models import Client
+from . import benchmark, flickr, hostlimit, notifications, tasks
+from .podcast import (
+    podcasts_for_hub_subscription,
+    calc_related_podcasts,
+    store_related_podcasts,
+)
+from .apps import update_podcast as notify_update
+from .feeddownloader import (
+    update_podcasts,
+    update_podcasts_concurrently,
+    MultiEpisodeUpdater,
+    PodcastUpdater,
+    MAX_EPISODES_UPDATE,
+)
+from .models import PodcastUpdateResult, FAILURE_BACKOFF, UPDATE_PHASES
 
 import responses
 
@@ -64,3 +92,663 @@ class FlickrTests(TestCase):
             )
 
         self.assertEqual(disp_photo, MEDIUM_URL)
+
+
+class HTTPClientTests(TestCase):
+    def setUp(self):
+        httpclient.stats.reset()
+
+    def test_stats(self):
+        url = "http://example.com/feed.xml"
+        with responses.RequestsMock() as rsps:
+            rsps.add(responses.GET, url, status=200, body="")
+            rsps.add(responses.GET, url, status=503, body="")
+
+            self.assertEqual(httpclient.get(url).status_code, 200)
+            self.assertEqual(httpclient.get(url).status_code, 503)
+
+        stats = httpclient.get_stats()
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["error_rate"], 0.5)
+
+
+class ConcurrentUpdateTests(TestCase):
+    @mock.patch("mygpo.data.feeddownloader.PodcastUpdater")
+    def test_update_concurrently(self, mock_updater):
+        """All podcasts of the queue are updated when using multiple workers"""
+        mock_updater.side_effect = lambda url: mock.Mock(
+            update_podcast=mock.Mock(return_value=url)
+        )
+
+        urls = ["http://example.com/feed%d.xml" % n for n in range(10)]
+        results = list(update_podcasts_concurrently(urls + [""], 3))
+
+        self.assertEqual(sorted(filter(None, results)), sorted(urls))
+        self.assertEqual(len(results), len(urls) + 1)
+
+
+class ScheduleUpdatesTests(TestCase):
+    @override_settings(FEED_UPDATE_BATCH_SIZE=4)
+    @mock.patch("mygpo.data.tasks.celery")
+    def test_batches(self, mock_celery):
+        """Several podcasts are updated in one task"""
+        podcasts = [
+            mock.Mock(url="http://example.com/feed%d.xml" % n) for n in range(10)
+        ]
+        tasks._schedule_updates(podcasts)
+
+        batches = [c.kwargs["args"][0] for c in mock_celery.send_task.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        self.assertEqual(sum(batches, []), [p.url for p in podcasts])
+
+    def test_failing_podcast(self):
+        """A failing update does not prevent the following ones"""
+        urls = ["http://example.com/broken.xml", "http://example.com/feed.xml"]
+        podcast = mock.Mock()
+
+        with mock.patch.object(
+            PodcastUpdater, "update_podcast", side_effect=[ValueError, podcast]
+        ):
+            self.assertEqual(list(update_podcasts(urls)), [None, podcast])
+
+    @mock.patch("mygpo.data.tasks.get_max_updates", return_value=2)
+    @mock.patch("mygpo.data.tasks.celery")
+    def test_queued_podcasts(self, mock_celery, _max_updates):
+        """Podcasts are not scheduled again while their updates are queued"""
+        for n in range(4):
+            podcast = Podcast.objects.get_or_create_for_url(
+                "http://example.com/queued%d.xml" % n
+            ).object
+            podcast.last_update = datetime.utcnow() - timedelta(days=30)
+            podcast.save()
+
+        def scheduled_urls():
+            tasks.schedule_updates()
+            batches = [
+                c.kwargs["args"][0] for c in mock_celery.send_task.call_args_list
+            ]
+            mock_celery.reset_mock()
+            return set(sum(batches, []))
+
+        first = scheduled_urls()
+        second = scheduled_urls()
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(first & second)
+
+    @override_settings(FEED_UPDATE_WORKERS=4)
+    def test_max_updates(self):
+        """The number of scheduled updates depends on their duration"""
+        self.assertEqual(tasks.get_max_updates(timedelta(hours=1)), 4 * 360)
+
+        for duration in (1, 3):
+            PodcastUpdateResult.objects.create(
+                id=uuid.uuid4(),
+                podcast_url="http://example.com/feed.xml",
+                duration=timedelta(seconds=duration),
+                successful=True,
+                podcast_created=False,
+                episodes_added=0,
+            )
+
+        self.assertEqual(tasks.get_max_updates(timedelta(hours=1)), 4 * 1800)
+
+
+def parsed_episode(n, **kwargs):
+    """Returns a parsed episode as returned by the feed-service"""
+    episode = {
+        "guid": "episode-%d" % n,
+        "title": "Episode %d" % n,
+        "description": "Description of episode %d" % n,
+        "released": 1500000000 + n * 86400,
+        "files": [
+            {
+                "urls": ["http://example.com/episode%d.mp3" % n],
+                "filesize": 1000 + n,
+                "mimetype": "audio/mpeg",
+            }
+        ],
+    }
+    episode.update(kwargs)
+    return episode
+
+
+class MultiEpisodeUpdaterTests(TestCase):
+    def setUp(self):
+        self.podcast = Podcast.objects.create(id=uuid.uuid1(), title="Podcast")
+
+    def update_episodes(self, parsed_episodes):
+        result = PodcastUpdateResult(podcast=self.podcast, episodes_added=0)
+        updater = MultiEpisodeUpdater(self.podcast, result)
+        updater.update_episodes(parsed_episodes)
+        return result
+
+    def test_episodes_added(self):
+        """New episodes are created and counted"""
+        res = self.update_episodes([parsed_episode(n) for n in range(10)])
+        self.assertEqual(res.episodes_added, 10)
+
+        res = self.update_episodes([parsed_episode(n) for n in range(15)])
+        self.assertEqual(res.episodes_added, 5)
+
+        self.podcast.refresh_from_db()
+        self.assertEqual(self.podcast.episode_count, 15)
+        self.assertEqual(Episode.objects.filter(podcast=self.podcast).count(), 15)
+
+    def test_url_without_episode(self):
+        """Episodes for URLs of missing episodes are not counted again"""
+        URL.objects.create(
+            url="http://example.com/episode0.mp3",
+            order=0,
+            scope=self.podcast.as_scope,
+            content_type=ContentType.objects.get_for_model(Episode),
+            object_id=uuid.uuid1(),
+        )
+
+        res = self.update_episodes([parsed_episode(n) for n in range(2)])
+        self.assertEqual(res.episodes_added, 2)
+
+        self.podcast.refresh_from_db()
+        self.assertEqual(self.podcast.episode_count, 1)
+        self.assertEqual(Episode.objects.filter(podcast=self.podcast).count(), 2)
+
+    def test_release_stats(self):
+        """The release statistics are updated from new episodes"""
+        result = PodcastUpdateResult(podcast=self.podcast, episodes_added=0)
+        updater = MultiEpisodeUpdater(self.podcast, result)
+        updater.update_episodes([parsed_episode(n) for n in range(3)])
+        updater.update_release_stats()
+
+        self.assertEqual(self.podcast.release_count, 3)
+        self.assertEqual(self.podcast.release_interval, 24)
+        self.assertEqual(updater.get_update_interval(), 24)
+
+        # a new episode after two days; known episodes are not counted again
+        result = PodcastUpdateResult(podcast=self.podcast, episodes_added=0)
+        updater = MultiEpisodeUpdater(self.podcast, result)
+        updater.update_episodes([parsed_episode(n) for n in (0, 1, 2, 4)])
+        updater.update_release_stats()
+
+        self.assertEqual(self.podcast.release_count, 4)
+        self.assertEqual(self.podcast.release_interval, 0.25 * 48 + 0.75 * 24)
+
+    def test_episodes_updated(self):
+        """Existing episodes are updated, and get their missing URLs"""
+        self.update_episodes([parsed_episode(1)])
+
+        episode = parsed_episode(1, title="New Title")
+        episode["files"][0]["urls"].append("http://example.com/mirror/1.mp3")
+        res = self.update_episodes([episode])
+        self.assertEqual(res.episodes_added, 0)
+
+        episode = Episode.objects.get(podcast=self.podcast)
+        self.assertEqual(episode.title, "New Title")
+        self.assertEqual(
+            [u.url for u in episode.urls.all()],
+            ["http://example.com/episode1.mp3", "http://example.com/mirror/1.mp3"],
+        )
+
+    def test_episodes_outdated(self):
+        """Episodes that are not in the feed anymore are marked outdated"""
+        self.update_episodes([parsed_episode(n) for n in range(10)])
+
+        res = self.update_episodes([parsed_episode(n) for n in range(3, 10)])
+        self.assertEqual(res.episodes_outdated, 3)
+
+        outdated = Episode.objects.filter(podcast=self.podcast, outdated=True)
+        self.assertEqual(
+            set(outdated.values_list("guid", flat=True)),
+            {"episode-0", "episode-1", "episode-2"},
+        )
+
+        # all episodes are marked outdated if there are none in the feed
+        res = self.update_episodes([])
+        self.assertEqual(res.episodes_outdated, 7)
+
+    def test_bulk_queries(self):
+        """The number of queries does not depend on the number of episodes"""
+        self.update_episodes([parsed_episode(n) for n in range(5)])
+
+        with CaptureQueriesContext(connection) as few:
+            self.update_episodes([parsed_episode(n) for n in range(10)])
+
+        with CaptureQueriesContext(connection) as many:
+            self.update_episodes([parsed_episode(n) for n in range(50)])
+
+        self.assertEqual(len(few), len(many))
+
+    def test_assign_slugs(self):
+        """Slugs are assigned in bulk and do not collide with existing ones"""
+        result = PodcastUpdateResult(podcast=self.podcast, episodes_added=0)
+        updater = MultiEpisodeUpdater(self.podcast, result)
+        updater.update_episodes([parsed_episode(n) for n in range(2)])
+        updater.assign_missing_episode_slugs()
+
+        # the episode number is used as slug; "2" is already taken
+        Episode.objects.get(podcast=self.podcast, guid="episode-0").set_slug("2")
+        updater.update_episodes([parsed_episode(n) for n in range(10)])
+
+        with CaptureQueriesContext(connection) as queries:
+            updater.assign_missing_episode_slugs()
+
+        self.assertLess(len(queries), 10)
+        episode = Episode.objects.get(podcast=self.podcast, guid="episode-2")
+        self.assertEqual(episode.slug, "2-1")
+        episode = Episode.objects.get(podcast=self.podcast, guid="episode-9")
+        self.assertEqual(episode.slug, "9")
+
+    def test_order_episodes(self):
+        """Episodes are ordered by their release timestamp"""
+        episodes = [parsed_episode(n) for n in range(5)]
+        episodes.append(parsed_episode(5, released=None))
+
+        result = PodcastUpdateResult(podcast=self.podcast, episodes_added=0)
+        updater = MultiEpisodeUpdater(self.podcast, result)
+        updater.update_episodes(episodes)
+        self.podcast.refresh_from_db()
+
+        self.assertEqual(updater.order_episodes(), 5)
+
+        orders = Episode.objects.filter(podcast=self.podcast).values_list(
+            "guid", "order"
+        )
+        self.assertEqual(
+            dict(orders),
+            {
+                "episode-5": 0,
+                "episode-0": 1,
+                "episode-1": 2,
+                "episode-2": 3,
+                "episode-3": 4,
+                "episode-4": 5,
+            },
+        )
+
+        # a new episode is inserted at the top
+        updater.update_episodes(episodes + [parsed_episode(6)])
+        self.podcast.refresh_from_db()
+        self.assertEqual(updater.order_episodes(), 6)
+
+        self.assertEqual(
+            Episode.objects.get(podcast=self.podcast, guid="episode-6").order, 6
+        )
+
+
+FEED_URL = "http://example.com/feed.xml"
+
+FEEDSERVICE_URL = re.compile(re.escape(settings.FEEDSERVICE_URL) + "parse.*")
+
+
+def parsed_podcast(num_episodes, **kwargs):
+    """Returns a parsed podcast as returned by the feed-service"""
+    podcast = {
+        "title": "My Podcast",
+        "description": "A podcast",
+        "link": "http://example.com/",
+        "language": "en",
+        "content_types": ["audio"],
+        "urls": [FEED_URL],
+        "episodes": [parsed_episode(n) for n in range(num_episodes)],
+    }
+    podcast.update(kwargs)
+    return podcast
+
+
+class PodcastUpdaterTests(TestCase):
+    def update_podcast(self, parsed):
+        with responses.RequestsMock() as rsps:
+            rsps.add(
+                responses.GET, FEEDSERVICE_URL, status=200, body=json.dumps([parsed])
+            )
+            return PodcastUpdater(FEED_URL).update_podcast()
+
+    def test_update_podcast(self):
+        """A new podcast is created with all its episodes"""
+        podcast = self.update_podcast(parsed_podcast(5))
+
+        self.assertEqual(podcast.title, "My Podcast")
+        self.assertEqual(podcast.episode_count, 5)
+        self.assertEqual(podcast.max_episode_order, 4)
+
+        result = PodcastUpdateResult.objects.get(podcast=podcast)
+        self.assertTrue(result.successful)
+        self.assertTrue(result.podcast_created)
+        self.assertEqual(result.episodes_added, 5)
+
+        # the durations of all phases have been recorded
+        self.assertEqual(set(result.phase_durations), set(UPDATE_PHASES))
+
+        # the common title of the episodes is stored
+        self.assertEqual(podcast.common_episode_title, "Episode ")
+        episode = Episode.objects.get(podcast=podcast, guid="episode-3")
+        self.assertEqual(episode.slug, "3")
+
+        podcast = self.update_podcast(parsed_podcast(6))
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertFalse(result.podcast_created)
+        self.assertEqual(result.episodes_added, 1)
+        self.assertEqual(podcast.episode_count, 6)
+
+    def test_unchanged_podcast(self):
+        """Updating an unchanged podcast does not write anything"""
+        podcast = self.update_podcast(parsed_podcast(5))
+        last_update = podcast.last_update
+
+        # the response differs, but the podcast and its episodes do not
+        parsed = parsed_podcast(5)
+        parsed["episodes"].reverse()
+        podcast = self.update_podcast(parsed)
+
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertFalse(result.not_modified)
+        self.assertTrue(result.podcast_unchanged)
+        self.assertEqual(result.episodes_unchanged, 5)
+        self.assertGreater(podcast.last_update, last_update)
+
+        # a changed episode causes a "full" update
+        parsed = parsed_podcast(5)
+        parsed["episodes"][0]["title"] = "New Title"
+        podcast = self.update_podcast(parsed)
+
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertFalse(result.podcast_unchanged)
+        self.assertEqual(result.episodes_unchanged, 4)
+
+    def test_not_modified(self):
+        """A feed that has not been modified is not processed at all"""
+        podcast = self.update_podcast(parsed_podcast(5))
+
+        # identical response
+        podcast = self.update_podcast(parsed_podcast(5))
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertTrue(result.not_modified)
+        self.assertEqual(result.episodes_unchanged, 0)
+
+        # 304 Not Modified
+        with responses.RequestsMock() as rsps:
+            rsps.add(responses.GET, FEEDSERVICE_URL, status=304)
+            podcast = PodcastUpdater(FEED_URL).update_podcast()
+
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertTrue(result.not_modified)
+        self.assertEqual(podcast.episode_count, 5)
+
+    def test_failure_backoff(self):
+        """The next update of a failing podcast is delayed exponentially"""
+        podcast = self.update_podcast(parsed_podcast(5))
+
+        # the regular update interval is shorter than the backoff
+        podcast.update_interval = 5
+        podcast.save()
+
+        for failures in (1, 2):
+            with responses.RequestsMock() as rsps:
+                rsps.add(responses.GET, FEEDSERVICE_URL, status=500)
+                PodcastUpdater(FEED_URL).update_podcast()
+
+            result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+            self.assertFalse(result.successful)
+            self.assertEqual(result.consecutive_failures, failures)
+
+            podcast = Podcast.objects.get(pk=podcast.pk)
+            backoff = FAILURE_BACKOFF * 2 ** (failures - 1)
+            self.assertEqual(podcast.next_update, result.start + backoff)
+
+        # the backoff survives unrelated saves of the podcast
+        podcast.subscribers = 10
+        podcast.save()
+        self.assertEqual(podcast.next_update, result.start + backoff)
+
+        # a successful update resets the counter and the backoff
+        podcast = self.update_podcast(parsed_podcast(5))
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertEqual(result.consecutive_failures, 0)
+        self.assertIsNone(podcast.backoff_until)
+        self.assertLess(podcast.next_update, result.start + backoff)
+
+
+class HostLimitTests(TestCase):
+    @override_settings(FEED_UPDATE_HOST_CONCURRENCY=1)
+    def test_concurrency(self):
+        """Only a limited number of updates per host can run at a time"""
+        with hostlimit.host_slot("http://example.com/feed1.xml"):
+            with self.assertRaises(hostlimit.HostBusy):
+                with hostlimit.host_slot("http://example.com/feed2.xml"):
+                    pass
+
+            # other hosts are not affected
+            with hostlimit.host_slot("http://example.org/feed.xml"):
+                pass
+
+        with hostlimit.host_slot("http://example.com/feed2.xml"):
+            pass
+
+    @override_settings(FEED_UPDATE_HOST_CONCURRENCY=1)
+    def test_busy_host(self):
+        """Updates of busy hosts are skipped, and the podcasts made due"""
+        url = "http://example.com/busy.xml"
+        podcast = Podcast.objects.get_or_create_for_url(url).object
+        Podcast.objects.filter(pk=podcast.pk).update(
+            next_update=datetime.utcnow() + timedelta(hours=3)
+        )
+
+        with hostlimit.host_slot("http://example.com/feed.xml"):
+            self.assertEqual(list(update_podcasts([url])), [None])
+
+        podcast.refresh_from_db()
+        self.assertLessEqual(podcast.next_update, datetime.utcnow())
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch.object(notifications, "is_shared_cache", return_value=True)
+    def test_coalesce(self, _shared_cache):
+        """Notifications are dropped while an update is pending"""
+        url = "http://example.com/feed.xml"
+
+        with mock.patch.object(tasks.update_notified_podcast, "apply_async") as run:
+            notify_update(url)
+            notify_update(url)
+            self.assertEqual(run.call_count, 1)
+
+            with notifications.pending_update(url):
+                notify_update(url)
+                self.assertEqual(run.call_count, 1)
+
+            # the update has finished
+            notify_update(url)
+            self.assertEqual(run.call_count, 2)
+
+        stats = notifications.get_stats()
+        self.assertEqual(stats["pings_received"], 4)
+        self.assertEqual(stats["updates_executed"], 1)
+
+    def test_process_local_cache(self):
+        """Without a shared cache, every notification is processed
+
+        The marker could only be cleared by the process that set it, not by
+        the worker that runs the update."""
+        url = "http://example.com/feed.xml"
+        self.assertFalse(notifications.is_shared_cache())
+
+        with mock.patch.object(tasks.update_notified_podcast, "apply_async") as run:
+            notify_update(url)
+            notify_update(url)
+            self.assertEqual(run.call_count, 2)
+
+
+class HubSubscriptionTests(TestCase):
+    def test_renewal(self):
+        """Subscriptions are sent for new hubs and renewed before expiry"""
+        hub = "http://hub.example.com/"
+        now = datetime.utcnow()
+        podcasts = [
+            Podcast.objects.get_or_create_for_url(
+                "http://example.com/feed%d.xml" % n, defaults={"hub": hub}
+            ).object
+            for n in range(4)
+        ]
+
+        def subscribe(podcast, lease_expires, hub_url=hub):
+            subscription = HubSubscription.objects.create(
+                podcast=podcast,
+                topic_url=podcast.url,
+                hub_url=hub_url,
+                mode=HubSubscription.SUBSCRIBE,
+                verified=True,
+                lease_expires=lease_expires,
+            )
+            # pretend that the subscription has been sent long ago
+            HubSubscription.objects.filter(pk=subscription.pk).update(
+                modified=now - timedelta(days=10)
+            )
+
+        subscribe(podcasts[1], now + timedelta(days=10))
+        subscribe(podcasts[2], now + timedelta(hours=1))
+        subscribe(podcasts[3], now + timedelta(days=10), "http://old.example.com/")
+
+        due = podcasts_for_hub_subscription(
+            until=now + tasks.HUB_RENEWAL_MARGIN,
+            retry_after=now - tasks.HUB_RETRY_INTERVAL,
+        )
+        self.assertEqual(set(due), {podcasts[0], podcasts[2], podcasts[3]})
+
+        # a subscription that has just been requested is not sent again
+        HubSubscription.objects.filter(podcast=podcasts[2]).update(modified=now)
+        self.assertNotIn(podcasts[2], due.all())
+
+    def test_live(self):
+        """Only subscriptions whose lease has not expired are live"""
+        now = datetime.utcnow()
+        podcast = Podcast.objects.get_or_create_for_url(
+            "http://example.com/live.xml"
+        ).object
+        subscriptions = HubSubscription.objects.filter(podcast=podcast)
+        HubSubscription.objects.create(
+            podcast=podcast,
+            topic_url=podcast.url,
+            hub_url="http://hub.example.com/",
+            mode=HubSubscription.SUBSCRIBE,
+            verified=True,
+            lease_expires=now + timedelta(days=1),
+        )
+
+        self.assertTrue(subscriptions.live().exists())
+        self.assertFalse(subscriptions.live(now + timedelta(days=2)).exists())
+
+        subscriptions.update(lease_expires=now - timedelta(hours=1))
+        self.assertFalse(subscriptions.live().exists())
+
+
+class RelatedPodcastsTests(TestCase):
+    def test_related_podcasts(self):
+        """Podcasts with enough common subscribers are related"""
+        now = datetime.utcnow()
+        User = get_user_model()
+        a, b, c = [Podcast.objects.create(id=uuid.uuid1()) for _ in range(3)]
+
+        def subscribe(user, *podcasts):
+            client = Client.objects.create(user=user, uid="dev", id=uuid.uuid1())
+            for podcast in podcasts:
+                Subscription.objects.create(
+                    user=user,
+                    client=client,
+                    podcast=podcast,
+                    ref_url="http://example.com/feed.xml",
+                    created=now,
+                    modified=now,
+                )
+
+        users = [
+            User.objects.create(username="user%d" % n, email="user%d@example.com" % n)
+            for n in range(3)
+        ]
+        subscribe(users[0], a, b, c)
+        subscribe(users[1], a, b)
+        subscribe(users[2], a, b)
+
+        related = calc_related_podcasts()
+        self.assertEqual(related[a.pk], [b.pk])
+        self.assertEqual(related[b.pk], [a.pk])
+        self.assertNotIn(c.pk, related)
+
+        # the result does not depend on the number of podcasts per pass
+        self.assertEqual(calc_related_podcasts(chunk_size=1), related)
+
+        c.related_podcasts.add(a)
+        store_related_podcasts(related)
+        self.assertEqual(list(a.related_podcasts.all()), [b])
+        self.assertEqual(list(c.related_podcasts.all()), [])
+
+
+def rss_feed(num_episodes):
+    """Returns an RSS feed with the given number of episodes"""
+    items = "".join(
+        """<item>
+             <title>Episode {n}</title>
+             <guid>episode-{n}</guid>
+             <pubDate>Fri, 14 Jul 2017 02:40:00 +0000</pubDate>
+             <itunes:duration>10:00</itunes:duration>
+             <enclosure url="http://example.com/episode{n}.mp3" length="{n}"
+                        type="audio/mpeg" />
+           </item>""".format(
+            n=n
+        )
+        for n in range(num_episodes)
+    )
+    return """<?xml version="1.0" encoding="utf-8"?>
+        <rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">
+          <channel>
+            <title>My Podcast</title>
+            <link>http://example.com/</link>
+            <language>en</language>
+            {items}
+          </channel>
+        </rss>""".format(
+        items=items
+    )
+
+
+@override_settings(FEED_PARSER="mygpo.data.parsers.StreamingFeedParser")
+class StreamingFeedParserTests(TestCase):
+    def test_update_podcast(self):
+        """Feeds are parsed in-process, up to MAX_EPISODES_UPDATE episodes"""
+        with responses.RequestsMock() as rsps:
+            rsps.add(responses.GET, FEED_URL, status=200, body=rss_feed(250))
+            podcast = PodcastUpdater(FEED_URL).update_podcast()
+
+        self.assertEqual(podcast.title, "My Podcast")
+        self.assertEqual(podcast.language, "en")
+        self.assertEqual(podcast.content_types, "audio")
+        self.assertEqual(podcast.episode_count, MAX_EPISODES_UPDATE)
+
+        episode = Episode.objects.get(podcast=podcast, guid="episode-3")
+        self.assertEqual(episode.title, "Episode 3")
+        self.assertEqual(episode.duration, 600)
+        self.assertEqual(episode.filesize, 3)
+        self.assertEqual(episode.released, datetime(2017, 7, 14, 2, 40))
+
+        # an identical feed is not processed again
+        with responses.RequestsMock() as rsps:
+            rsps.add(responses.GET, FEED_URL, status=200, body=rss_feed(250))
+            podcast = PodcastUpdater(FEED_URL).update_podcast()
+
+        result = PodcastUpdateResult.objects.filter(podcast=podcast).latest()
+        self.assertTrue(result.not_modified)
+
+
+class BenchmarkTests(TestCase):
+    def test_benchmark(self):
+        """The benchmark runs all scenarios and leaves no data behind"""
+        results = benchmark.run_benchmark(
+            num_feeds=2, num_episodes=3, num_large=1, large_episodes=300
+        )
+
+        self.assertEqual([r.name for r in results], ["import", "unchanged", "large"])
+        self.assertEqual([r.num_feeds for r in results], [2, 2, 1])
+        self.assertIn("episodes", results[0].queries)
+        self.assertNotIn("episodes", results[1].queries)
+        self.assertFalse(Podcast.objects.exists())
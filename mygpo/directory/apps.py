@@ -0,0 +1,33 @@
+from django.apps import AppConfig, apps
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from mygpo.subscriptions.signals import subscription_changed
+
+
+def update_subscriber_count(sender, **kwargs):
+    """adjusts the subscriber count of a podcast after a subscription change
+
+    Only a user's first subscription and last unsubscription are counted.
+    The counts are recalculated periodically by reconcile_subscriber_counts."""
+    if not kwargs.get("changes_subscribers"):
+        return
+
+    podcast = kwargs["instance"]
+    delta = 1 if kwargs["subscribed"] else -1
+    sender.objects.filter(pk=podcast.pk).update(
+        subscribers=Greatest(F("subscribers") + delta, Value(0))
+    )
+
+
+class DirectoryConfig(AppConfig):
+    name = "mygpo.directory"
+    verbose_name = "Directory"
+
+    def ready(self):
+        Podcast = apps.get_model("podcasts.Podcast")
+        subscription_changed.connect(
+            update_subscriber_count,
+            sender=Podcast,
+            dispatch_uid="update_subscriber_count",
+        )
@@ -1,12 +1,24 @@
+import time
+
 from django.core.management.base import BaseCommand
 
 from mygpo.podcasts.models import Podcast
 from mygpo.utils import progress
-from mygpo.directory.tasks import update_podcast_subscribers
+from mygpo.directory.tasks import (
+    update_podcast_subscribers,
+    refresh_subscriber_counts,
+    update_podcast_toplists,
+    SUBSCRIBER_COUNT_CHUNK_SIZE,
+)
 
 
 class Command(BaseCommand):
-    """For each podcast a task is scheduled to update its subscriber count"""
+    """For each podcast a task is scheduled to update its subscriber count
+
+    With --bulk, the subscriber counts of all podcasts are updated directly,
+    in chunks of podcasts. In both cases, the toplist snapshots are updated
+    afterwards; without --bulk, they do not yet include the scheduled
+    updates, which are picked up by the periodic update_toplists task."""
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,6 +29,23 @@ class Command(BaseCommand):
             help="Don't show any output",
         ),
 
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            dest="bulk",
+            default=False,
+            help="Count the subscribers of all podcasts instead of scheduling tasks",
+        )
+
+        parser.add_argument(
+            "--chunk-size",
+            action="store",
+            dest="chunk_size",
+            type=int,
+            default=SUBSCRIBER_COUNT_CHUNK_SIZE,
+            help="Number of podcasts that are counted in one query (with --bulk)",
+        )
+
     def handle(self, *args, **options):
 
         silent = options.get("silent")
@@ -24,8 +53,41 @@ class Command(BaseCommand):
         podcasts = Podcast.objects.all()
         total = podcasts.count()
 
-        for n, podcast in enumerate(podcasts):
-            update_podcast_subscribers.delay(podcast.get_id())
+        if options.get("bulk"):
+            self._refresh(total, options["chunk_size"], silent)
+
+        else:
+            for n, podcast in enumerate(podcasts):
+                update_podcast_subscribers.delay(podcast.get_id())
+
+                if not silent:
+                    progress(n, total)
+
+            if not silent:
+                self.stdout.write("")
+
+        languages = update_podcast_toplists()
+
+        if not silent:
+            self.stdout.write("Updated toplists of %d languages" % len(languages))
+
+    def _refresh(self, total, chunk_size, silent):
+        start = time.monotonic()
+        num_podcasts = 0
+        num_changed = 0
+
+        for chunk_podcasts, chunk_changed in refresh_subscriber_counts(chunk_size):
+            num_podcasts += chunk_podcasts
+            num_changed += chunk_changed
 
             if not silent:
-                progress(n, total)
+                progress(num_podcasts, total, "%d changed" % num_changed)
+
+        if not silent:
+            self.stdout.write(
+                "\nUpdated {changed} of {total} podcasts in {duration:.1f}s".format(
+                    changed=num_changed,
+                    total=num_podcasts,
+                    duration=time.monotonic() - start,
+                )
+            )
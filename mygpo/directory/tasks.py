@@ -1,8 +1,14 @@
+from django.db.models import Count
 from django_db_geventpool.utils import close_connection
 from celery import shared_task
 
-from mygpo.podcasts.models import Podcast
+from mygpo.podcasts.models import Podcast, PodcastToplist
 from mygpo.subscriptions.models import Subscription
+from mygpo.web.utils import sanitize_language_codes
+
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
 
 
 @shared_task(max_retries=5)
@@ -25,3 +31,93 @@ def update_podcast_subscribers(podcast_id):
     # TODO: which exceptions?
     except Exception as ex:
         raise update_podcast_subscribers.retry(exc=ex)
+
+
+# number of podcasts whose subscribers are counted in one query
+SUBSCRIBER_COUNT_CHUNK_SIZE = 10000
+
+
+def refresh_subscriber_counts(chunk_size=SUBSCRIBER_COUNT_CHUNK_SIZE):
+    """Recounts the subscribers of all podcasts
+
+    The subscribers of a chunk of podcasts are counted in one aggregate
+    query, and only the counts that have changed are written. Yields the
+    number of podcasts and the number of changed counts for each chunk."""
+    podcasts = Podcast.objects.order_by("pk")
+    last_pk = None
+
+    while True:
+        chunk = podcasts if last_pk is None else podcasts.filter(pk__gt=last_pk)
+        chunk = list(chunk.values_list("pk", "subscribers")[:chunk_size])
+        if not chunk:
+            return
+
+        last_pk = chunk[-1][0]
+
+        counts = dict(
+            Subscription.objects.filter(podcast__in=[pk for pk, _ in chunk])
+            .values("podcast")
+            .annotate(count=Count("user", distinct=True))
+            .values_list("podcast", "count")
+        )
+
+        changed = [
+            Podcast(pk=pk, subscribers=counts.get(pk, 0))
+            for pk, subscribers in chunk
+            if counts.get(pk, 0) != subscribers
+        ]
+        Podcast.objects.bulk_update(changed, ["subscribers"], batch_size=1000)
+
+        yield len(chunk), len(changed)
+
+
+@shared_task
+@close_connection
+def reconcile_subscriber_counts():
+    """Corrects the drift of incrementally updated subscriber counts"""
+    num_podcasts = 0
+    num_changed = 0
+
+    for chunk_podcasts, chunk_changed in refresh_subscriber_counts():
+        num_podcasts += chunk_podcasts
+        num_changed += chunk_changed
+
+    logger.info("Corrected %d of %d subscriber counts", num_changed, num_podcasts)
+
+    update_podcast_toplists()
+
+
+# number of podcasts in a toplist snapshot
+TOPLIST_SIZE = 100
+
+
+@shared_task
+@close_connection
+def update_toplists():
+    """Updates the toplist snapshots from the current subscriber counts"""
+    languages = update_podcast_toplists()
+    logger.info("Updated toplists of %d languages", len(languages))
+
+
+def update_podcast_toplists(size=TOPLIST_SIZE):
+    """Stores snapshots of the most subscribed podcasts for each language
+
+    Returns the languages of the snapshots; the empty language stands for
+    podcasts of all languages."""
+    languages = (
+        Podcast.objects.exclude(language__isnull=True)
+        .order_by()
+        .values_list("language", flat=True)
+        .distinct()
+    )
+    languages = [""] + sorted(sanitize_language_codes(languages))
+
+    for language in languages:
+        podcasts = Podcast.objects.all().by_subscribers(language)
+        podcast_ids = [pk.hex for pk in podcasts.values_list("pk", flat=True)[:size]]
+        PodcastToplist.objects.update_or_create(
+            language=language, defaults={"podcast_ids": podcast_ids}
+        )
+
+    PodcastToplist.objects.exclude(language__in=languages).delete()
+    return languages
@@ -9,7 +9,10 @@ from django.test import TestCase
 from mygpo.data.feeddownloader import NoEpisodesException
 
 from mygpo.podcasts.models import Podcast
+from mygpo.users.models import Client
+from mygpo.subscriptions.models import Subscription
 from mygpo.directory.views import MissingPodcast, ToplistView
+from mygpo.directory.tasks import refresh_subscriber_counts, update_podcast_toplists
 
 
 class ToplistTests(unittest.TestCase):
@@ -108,3 +111,62 @@ class MissingPodcastTests(TestCase):
         )
 
         self.assertNotContains(response, "Add Podcast")
+
+
+class SubscriberCountTests(TestCase):
+    def test_refresh_subscriber_counts(self):
+        """Subscribers are counted once per user, only changes are written"""
+        now = datetime.utcnow()
+        User = get_user_model()
+        podcasts = [
+            Podcast.objects.create(id=uuid.uuid1(), subscribers=n) for n in (0, 5, 1)
+        ]
+
+        for n in range(2):
+            user = User.objects.create(
+                username="subscriber-%d" % n, email="subscriber-%d@example.com" % n
+            )
+            for uid in ("dev1", "dev2"):
+                client = Client.objects.create(user=user, uid=uid, id=uuid.uuid1())
+                for podcast in podcasts[:2]:
+                    Subscription.objects.create(
+                        user=user,
+                        client=client,
+                        podcast=podcast,
+                        ref_url="http://example.com/feed.xml",
+                        created=now,
+                        modified=now,
+                    )
+
+        chunks = list(refresh_subscriber_counts(chunk_size=2))
+        self.assertEqual(sum(changed for _, changed in chunks), 3)
+        self.assertTrue(all(num <= 2 for num, _ in chunks))
+
+        counts = [Podcast.objects.get(pk=p.pk).subscribers for p in podcasts]
+        self.assertEqual(counts, [2, 2, 0])
+
+
+class PodcastToplistTests(TestCase):
+    def test_toplist_snapshot(self):
+        """Toplists are read from the latest snapshot"""
+        podcasts = [
+            Podcast.objects.create(id=uuid.uuid1(), language="sv", subscribers=n)
+            for n in range(3)
+        ]
+
+        languages = update_podcast_toplists(size=2)
+        self.assertIn("", languages)
+        self.assertIn("sv", languages)
+
+        toplist = list(Podcast.objects.all().toplist("sv"))
+        self.assertEqual(toplist, [podcasts[2], podcasts[1]])
+
+        # a new podcast only appears in the toplist after the next snapshot
+        new_podcast = Podcast.objects.create(
+            id=uuid.uuid1(), language="sv", subscribers=10
+        )
+        self.assertNotIn(new_podcast, Podcast.objects.all().toplist("sv"))
+
+        update_podcast_toplists(size=2)
+        toplist = list(Podcast.objects.all().toplist("sv"))
+        self.assertEqual(toplist, [new_podcast, podcasts[2]])
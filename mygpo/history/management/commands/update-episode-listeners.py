@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mygpo.history.tasks import aggregate_episode_listeners
+
+
+class Command(BaseCommand):
+    """
+    Updates the listener counts of episodes
+
+    By default only episodes that have been played since the last run are
+    counted. With --rebuild, the listeners of all played episodes are
+    counted again.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            dest="rebuild",
+            default=False,
+            help="Count the listeners of all episodes",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        num_episodes, num_changed = aggregate_episode_listeners(
+            rebuild=options["rebuild"]
+        )
+        self.stdout.write(
+            "Updated listeners of {changed} of {total} episodes in "
+            "{duration:.1f}s".format(
+                changed=num_changed,
+                total=num_episodes,
+                duration=time.monotonic() - start,
+            )
+        )
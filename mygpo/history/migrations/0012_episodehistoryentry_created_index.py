@@ -0,0 +1,22 @@
+# Generated by Django 3.2.14 on 2026-10-18 21:30
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # the table is large; the index is built without locking it for writes,
+    # which is not possible within a transaction
+    atomic = False
+
+    dependencies = [
+        ("history", "0011_aggregationstate"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="episodehistoryentry",
+            index=models.Index(fields=["created"], name="history_entry_created_idx"),
+        ),
+    ]
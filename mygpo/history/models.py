@@ -118,6 +118,11 @@ class EpisodeHistoryEntry(models.Model):
             ["episode", "timestamp"],
         ]
 
+        indexes = [
+            # see aggregate_episode_listeners()
+            models.Index(fields=["created"], name="history_entry_created_idx"),
+        ]
+
         ordering = ["-timestamp"]
 
         verbose_name_plural = "Episode History Entries"
@@ -212,3 +217,17 @@ class EpisodeHistoryEntry(models.Model):
                 )
             )
             return None
+
+
+class AggregationState(models.Model):
+    """Progress of an incremental aggregation over the history"""
+
+    # the name of the aggregation
+    name = models.CharField(max_length=50, unique=True)
+
+    # entries that were created up to this time have been processed; None if
+    # no entries have been processed yet
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return "{name} up to {mark}".format(name=self.name, mark=self.high_water_mark)
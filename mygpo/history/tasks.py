@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django_db_geventpool.utils import close_connection
+from celery import shared_task
+
+from mygpo.podcasts.models import Episode
+from mygpo.history.models import EpisodeHistoryEntry, AggregationState
+
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+# name of the AggregationState of the episode listener counts
+LISTENERS_AGGREGATION = "episode-listeners"
+
+# entries are only processed once they are this old, so that entries of
+# transactions that are still running are not skipped
+LISTENERS_LAG = timedelta(minutes=5)
+
+# number of episodes whose listeners are counted in one query
+LISTENERS_CHUNK_SIZE = 1000
+
+
+@shared_task
+@close_connection
+def update_episode_listeners():
+    """Updates the listeners of episodes that have been played recently"""
+    num_episodes, num_changed = aggregate_episode_listeners()
+    logger.info("Updated listeners of %d of %d episodes", num_changed, num_episodes)
+
+
+def aggregate_episode_listeners(rebuild=False, chunk_size=LISTENERS_CHUNK_SIZE):
+    """Counts the distinct users that have played each episode
+
+    Only episodes with play events that have been created since the stored
+    high-water mark are counted, unless ``rebuild`` is set. Changed counts
+    are written in batches. Returns the number of counted episodes and the
+    number of changed counts."""
+    state, _created = AggregationState.objects.get_or_create(name=LISTENERS_AGGREGATION)
+
+    until = datetime.utcnow() - LISTENERS_LAG
+    entries = EpisodeHistoryEntry.objects.filter(
+        action=EpisodeHistoryEntry.PLAY, created__lte=until
+    )
+    if state.high_water_mark is not None and not rebuild:
+        entries = entries.filter(created__gt=state.high_water_mark)
+
+    episodes = (
+        entries.exclude(episode=None)
+        .order_by()
+        .values_list("episode", flat=True)
+        .distinct()
+    )
+    episodes = list(episodes)
+
+    num_changed = 0
+    for n in range(0, len(episodes), chunk_size):
+        num_changed += _update_listeners(episodes[n : n + chunk_size])
+
+    state.high_water_mark = until
+    state.save()
+
+    return len(episodes), num_changed
+
+
+@transaction.atomic
+def _update_listeners(episode_ids):
+    """Recounts the listeners of the episodes, returns the number of changes"""
+    counts = dict(
+        EpisodeHistoryEntry.objects.filter(
+            episode__in=episode_ids, action=EpisodeHistoryEntry.PLAY
+        )
+        .order_by()
+        .values("episode")
+        .annotate(count=Count("user", distinct=True))
+        .values_list("episode", "count")
+    )
+
+    current = Episode.objects.filter(pk__in=episode_ids).values_list("pk", "listeners")
+    changed = [
+        Episode(pk=pk, listeners=counts.get(pk, 0))
+        for pk, listeners in current
+        if counts.get(pk, 0) != listeners
+    ]
+    Episode.objects.bulk_update(changed, ["listeners"], batch_size=1000)
+    return len(changed)
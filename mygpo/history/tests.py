@@ -1,3 +1,53 @@
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from mygpo.podcasts.models import Podcast, Episode
+from . import tasks
+from .models import EpisodeHistoryEntry
+
+
+@mock.patch.object(tasks, "LISTENERS_LAG", timedelta(0))
+class EpisodeListenersTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.users = [
+            User.objects.create(
+                username="listener-%d" % n, email="listener-%d@example.com" % n
+            )
+            for n in range(3)
+        ]
+        self.podcast = Podcast.objects.create(id=uuid.uuid1())
+        self.episode = Episode.objects.create(
+            id=uuid.uuid1(), podcast=self.podcast, order=0
+        )
+
+    def play(self, user, action=EpisodeHistoryEntry.PLAY):
+        EpisodeHistoryEntry.objects.create(
+            user=user, episode=self.episode, action=action, timestamp=datetime.utcnow()
+        )
+
+    def listeners(self):
+        return Episode.objects.get(pk=self.episode.pk).listeners
+
+    def test_aggregate_listeners(self):
+        """Distinct users that played an episode are counted incrementally"""
+        self.play(self.users[0])
+        self.play(self.users[0])
+        self.play(self.users[1])
+        self.play(self.users[2], EpisodeHistoryEntry.DOWNLOAD)
+
+        self.assertEqual(tasks.aggregate_episode_listeners(), (1, 1))
+        self.assertEqual(self.listeners(), 2)
+
+        # nothing has been played since the last run
+        self.assertEqual(tasks.aggregate_episode_listeners(), (0, 0))
+
+        self.play(self.users[2])
+        self.assertEqual(tasks.aggregate_episode_listeners(), (1, 1))
+        self.assertEqual(self.listeners(), 3)
+
+        self.assertEqual(tasks.aggregate_episode_listeners(rebuild=True), (1, 0))
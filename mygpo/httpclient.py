@@ -0,0 +1,189 @@
+"""Shared client for outgoing HTTP requests
+
+Requests to the feed-service, podcast logos, Flickr and PubSubHubbub hubs
+go through one session, so that connections to the same host are pooled and
+kept alive, and timeouts and retries are handled consistently.
+"""
+
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ClientStats(object):
+    """Thread-safe statistics about the requests of the client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.total_latency = 0.0
+
+            # connections of host pools that have already been discarded
+            self.discarded_connections = 0
+            self.discarded_pool_requests = 0
+
+    def record_request(self, latency, error):
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            if error:
+                self.errors += 1
+
+    def record_discarded_pool(self, pool):
+        with self._lock:
+            self.discarded_connections += pool.num_connections
+            self.discarded_pool_requests += pool.num_requests
+
+
+stats = ClientStats()
+
+
+class PoolingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that keeps track of the connections it opens"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+
+        # remember the numbers of host pools that are discarded when more
+        # than pool_connections hosts are contacted
+        pools = self.poolmanager.pools
+        dispose_func = pools.dispose_func
+
+        def dispose_pool(pool):
+            stats.record_discarded_pool(pool)
+            dispose_func(pool)
+
+        pools.dispose_func = dispose_pool
+
+    def get_pools(self):
+        pools = self.poolmanager.pools
+        return [pools[key] for key in pools.keys()]
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the shared session, which is created on first use"""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+
+    return _session
+
+
+def _create_session():
+    retries = Retry(
+        total=settings.HTTP_MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        raise_on_status=False,
+    )
+
+    adapter = PoolingHTTPAdapter(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = settings.USER_AGENT
+    return session
+
+
+def request(method, url, **kwargs):
+    """Sends a request through the shared session
+
+    Takes the same arguments as requests.request(). If no timeout is given,
+    HTTP_TIMEOUT is used."""
+
+    kwargs.setdefault("timeout", settings.HTTP_TIMEOUT)
+
+    start = time.monotonic()
+    try:
+        response = get_session().request(method, url, **kwargs)
+
+    except requests.exceptions.RequestException:
+        stats.record_request(time.monotonic() - start, error=True)
+        raise
+
+    stats.record_request(time.monotonic() - start, response.status_code >= 500)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get_stats():
+    """Returns statistics about the requests sent by this process
+
+    * requests: number of requests
+    * errors: number of failed requests and 5xx responses
+    * error_rate: errors / requests
+    * avg_latency: average duration of a request in seconds
+    * connections: number of connections that have been opened
+    * connection_reuse: fraction of requests that re-used a connection
+    """
+
+    connections = stats.discarded_connections
+    pool_requests = stats.discarded_pool_requests
+
+    if _session is not None:
+        # the same adapter is mounted for multiple prefixes
+        for adapter in set(_session.adapters.values()):
+            if not isinstance(adapter, PoolingHTTPAdapter):
+                continue
+
+            for pool in adapter.get_pools():
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+
+    num_requests = stats.requests
+
+    return {
+        "requests": num_requests,
+        "errors": stats.errors,
+        "error_rate": stats.errors / num_requests if num_requests else 0,
+        "avg_latency": stats.total_latency / num_requests if num_requests else 0,
+        "connections": connections,
+        "connection_reuse": (1 - connections / pool_requests if pool_requests else 0),
+    }
+
+
+def log_stats():
+    """Logs the statistics returned by get_stats()"""
+    client_stats = get_stats()
+    logger.info(
+        "HTTP client: %d requests, %.1f%% errors, %.2fs avg latency, "
+        "%d connections, %.1f%% connection reuse",
+        client_stats["requests"],
+        client_stats["error_rate"] * 100,
+        client_stats["avg_latency"],
+        client_stats["connections"],
+        client_stats["connection_reuse"] * 100,
+    )
@@ -94,7 +94,9 @@ class PodcastCommand(BaseCommand):
             yield (p.url for p in podcasts)
 
     def get_toplist(self, max_podcasts=100):
-        return Podcast.objects.all().toplist()[:max_podcasts]
+        # the toplist snapshots are limited in size, but any number of
+        # podcasts can be requested
+        return Podcast.objects.all().by_subscribers()[:max_podcasts]
 
 
 def random_podcasts():
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("podcasts", "0045_auto_20191230_2330"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="episode",
+            name="content_fingerprint",
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name="podcast",
+            name="content_fingerprint",
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
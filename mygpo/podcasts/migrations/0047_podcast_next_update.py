@@ -0,0 +1,27 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("podcasts", "0046_content_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcast",
+            name="next_update",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "UPDATE podcasts_podcast "
+                "SET next_update = last_update + (update_interval * "
+                "update_interval_factor || ' hours')::INTERVAL "
+                "WHERE last_update IS NOT NULL;"
+            ],
+            reverse_sql=[],
+        ),
+    ]
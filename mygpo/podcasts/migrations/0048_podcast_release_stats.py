@@ -0,0 +1,41 @@
+# Generated by Django 3.2.14 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("podcasts", "0047_podcast_next_update"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcast",
+            name="release_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="podcast",
+            name="release_interval",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        # initialize the statistics with the average interval between the
+        # releases of existing episodes
+        migrations.RunSQL(
+            sql=[
+                "UPDATE podcasts_podcast "
+                "SET release_count = s.count, "
+                "    release_interval = CASE WHEN s.count > 1 THEN "
+                "      EXTRACT(EPOCH FROM s.latest - s.earliest) / 3600 "
+                "      / (s.count - 1) END "
+                "FROM (SELECT podcast_id, COUNT(*) AS count, "
+                "        MIN(released) AS earliest, MAX(released) AS latest "
+                "      FROM podcasts_episode "
+                "      WHERE released IS NOT NULL AND released <= NOW() "
+                "      GROUP BY podcast_id) s "
+                "WHERE s.podcast_id = podcasts_podcast.id;"
+            ],
+            reverse_sql=[],
+        ),
+    ]
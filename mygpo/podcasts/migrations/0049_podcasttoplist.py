@@ -0,0 +1,37 @@
+# Generated by Django 3.2.14 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("podcasts", "0048_podcast_release_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PodcastToplist",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                (
+                    "language",
+                    models.CharField(blank=True, max_length=10, unique=True),
+                ),
+                ("podcast_ids", models.JSONField(default=list)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("podcasts", "0049_podcasttoplist"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="podcast",
+            name="backoff_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
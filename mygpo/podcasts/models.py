@@ -6,7 +6,7 @@ from datetime import timedelta
 from django.core.cache import cache
 from django.conf import settings
 from django.db import models, transaction, IntegrityError, DataError
-from django.db.models import F
+from django.db.models import F, Q, ExpressionWrapper
 from django.utils.translation import gettext as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericRelation, GenericForeignKey
@@ -39,6 +39,9 @@ MIN_UPDATE_INTERVAL = 5
 # every podcast should be updated at least once a month
 MAX_UPDATE_INTERVAL = 24 * 30
 
+# weight of the most recent gap between two releases in Podcast.release_interval
+RELEASE_INTERVAL_WEIGHT = 0.25
+
 
 class TitleModel(models.Model):
     """Model that has a title"""
@@ -92,6 +95,17 @@ class LastUpdateModel(models.Model):
         abstract = True
 
 
+class ContentFingerprintModel(models.Model):
+    """Model that keeps a fingerprint of the data it was updated from"""
+
+    # hash of the parsed data (eg from the feed-service) from which the model
+    # has last been updated. An update can be skipped if it is unchanged.
+    content_fingerprint = models.CharField(max_length=40, null=False, blank=True)
+
+    class Meta:
+        abstract = True
+
+
 class LicenseModel(models.Model):
     # URL to a license (usually Creative Commons)
     license = models.CharField(max_length=100, null=True, blank=True, db_index=True)
@@ -332,32 +346,49 @@ class PodcastQuerySet(MergedUUIDQuerySet):
 
     def order_by_next_update(self):
         """Sort podcasts by next scheduled update"""
-        NEXTUPDATE = (
-            "last_update + (update_interval * "
-            "update_interval_factor || ' hours')::INTERVAL"
-        )
-        q = self.extra(select={"_next_update": NEXTUPDATE})
-        return q.order_by("_next_update")
-
-    @property
-    def next_update(self):
-        interval = timedelta(hours=self.update_interval) * self.update_interval_factor
-        return self.last_update + interval
+        return self.order_by("next_update")
 
     def next_update_between(self, start, end):
-        NEXTUPDATE_BETWEEN = (
-            "(last_update + (update_interval * "
-            " update_interval_factor || "
-            "' hours')::INTERVAL) BETWEEN %s AND %s"
+        return self.filter(next_update__range=(start, end))
+
+    def due_for_update(self, until):
+        """Podcasts that are due for an update until the given time
+
+        Podcasts are returned in order of priority: podcasts that announce a
+        PubSubHubbub hub are notified of changes anyway and therefore come
+        last. Otherwise, more popular podcasts are updated first, and among
+        them those that have been waiting longest."""
+        return (
+            self.filter(next_update__lte=until)
+            .annotate(
+                has_hub=ExpressionWrapper(
+                    Q(hub__isnull=False), output_field=models.BooleanField()
+                )
+            )
+            .order_by("has_hub", "-subscribers", "next_update")
         )
-        return self.extra(where=[NEXTUPDATE_BETWEEN], params=[start, end])
 
-    def toplist(self, language=None):
-        toplist = self
+    def by_subscribers(self, language=None):
+        """Podcasts (of the given language) ordered by subscribers"""
+        podcasts = self
         if language:
-            toplist = toplist.filter(language=language)
+            podcasts = podcasts.filter(language=language)
 
-        return toplist.order_by("-subscribers")
+        return podcasts.order_by("-subscribers")
+
+    def toplist(self, language=None):
+        """The most subscribed podcasts (of the given language)
+
+        The podcasts are taken from the language's PodcastToplist snapshot, so
+        that not all podcasts have to be sorted. The snapshot only holds a
+        limited number of podcasts; use by_subscribers() if more are needed.
+        Without a snapshot, all podcasts are sorted instead."""
+        try:
+            snapshot = PodcastToplist.objects.get(language=language or "")
+        except PodcastToplist.DoesNotExist:
+            return self.by_subscribers(language)
+
+        return self.filter(pk__in=snapshot.podcast_ids).order_by("-subscribers")
 
 
 class PodcastManager(GenericManager):
@@ -534,6 +565,7 @@ class Podcast(
     LinkModel,
     LanguageModel,
     LastUpdateModel,
+    ContentFingerprintModel,
     UpdateInfoModel,
     LicenseModel,
     FlattrModel,
@@ -563,6 +595,11 @@ class Podcast(
     common_episode_title = models.CharField(max_length=100, null=False, blank=True)
     new_location = models.URLField(max_length=1000, null=True, blank=True)
     latest_episode_timestamp = models.DateTimeField(null=True, blank=True)
+
+    # exponentially weighted moving average of the hours between two
+    # releases, and the number of releases it is based on
+    release_interval = models.FloatField(null=True, blank=True)
+    release_count = models.PositiveIntegerField(default=0)
     episode_count = models.PositiveIntegerField(default=0, blank=True)
     hub = models.URLField(null=True, blank=True)
 
@@ -575,6 +612,15 @@ class Podcast(
     # new episodes
     update_interval_factor = models.FloatField(default=1)
 
+    # the podcast is not updated before this time because its previous
+    # updates have failed; cleared by the next successful update
+    backoff_until = models.DateTimeField(null=True, blank=True)
+
+    # materialized last_update + update_interval * update_interval_factor,
+    # but not before backoff_until, so that scheduling can use an index;
+    # kept current in save()
+    next_update = models.DateTimeField(null=True, blank=True, db_index=True)
+
     # "order" value of the most recent episode (will be the highest of all)
     max_episode_order = models.PositiveIntegerField(null=True, blank=True, default=None)
 
@@ -589,6 +635,23 @@ class Podcast(
     class Meta:
         index_together = [("last_update",)]
 
+    # fields from which next_update is calculated
+    SCHEDULING_FIELDS = {
+        "last_update",
+        "update_interval",
+        "update_interval_factor",
+        "backoff_until",
+    }
+
+    def save(self, *args, **kwargs):
+        self.next_update = self.get_next_update()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.SCHEDULING_FIELDS & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"next_update"}
+
+        super(Podcast, self).save(*args, **kwargs)
+
     def subscriber_count(self):
         # TODO: implement
         return self.subscribers
@@ -641,10 +704,15 @@ class Podcast(
         if self.common_episode_title:
             return self.common_episode_title
 
-        episodes = self.episode_set.all()[:num_episodes]
+        return self.calc_common_episode_title(num_episodes)
+
+    def calc_common_episode_title(self, num_episodes=100):
+        """Calculates the common title of the most recent episodes"""
+
+        titles = self.episode_set.values_list("title", flat=True)[:num_episodes]
 
         # We take all non-empty titles
-        titles = [_f for _f in (e.title for e in episodes) if _f]
+        titles = [_f for _f in titles if _f]
 
         # there can not be a "common" title of a single title
         if len(titles) < 2:
@@ -700,13 +768,36 @@ class Podcast(
             "Unknown Podcast from {domain}".format(domain=utils.get_domain(self.url))
         )
 
-    @property
-    def next_update(self):
+    def add_release(self, released):
+        """Updates the release statistics with a newly released episode
+
+        Releases have to be added in chronological order."""
+        if self.latest_episode_timestamp is not None:
+            gap = (released - self.latest_episode_timestamp).total_seconds() / 3600
+
+            if self.release_interval is None:
+                self.release_interval = gap
+            else:
+                self.release_interval = (
+                    RELEASE_INTERVAL_WEIGHT * gap
+                    + (1 - RELEASE_INTERVAL_WEIGHT) * self.release_interval
+                )
+
+        self.latest_episode_timestamp = released
+        self.release_count += 1
+
+    def get_next_update(self):
+        """Calculate when the podcast should be updated next"""
         if not self.last_update:
-            return None
+            return self.backoff_until
 
         interval = timedelta(hours=self.update_interval) * self.update_interval_factor
-        return self.last_update + interval
+        next_update = self.last_update + interval
+
+        if self.backoff_until and self.backoff_until > next_update:
+            return self.backoff_until
+
+        return next_update
 
 
 class EpisodeQuerySet(MergedUUIDQuerySet):
@@ -793,6 +884,7 @@ class Episode(
     LinkModel,
     LanguageModel,
     LastUpdateModel,
+    ContentFingerprintModel,
     UpdateInfoModel,
     LicenseModel,
     FlattrModel,
@@ -898,3 +990,16 @@ class Tag(models.Model):
             # a tag can only be assigned once from one source to one item
             ("tag", "source", "user", "content_type", "object_id"),
         )
+
+
+class PodcastToplist(UpdateInfoModel):
+    """Snapshot of the most subscribed podcasts of a language"""
+
+    # the language of the podcasts; empty for podcasts of all languages
+    language = models.CharField(max_length=10, unique=True, blank=True)
+
+    # the IDs of the podcasts, most subscribed first
+    podcast_ids = models.JSONField(default=list)
+
+    def __str__(self):
+        return "Toplist {language}".format(language=self.language or "(all)")
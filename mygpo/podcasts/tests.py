@@ -28,6 +28,44 @@ class PodcastTests(unittest.TestCase):
         # assert that the next_update property is calculated correctly
         self.assertEqual(p.next_update, last_update + timedelta(hours=update_interval))
 
+    def test_next_update_stored(self):
+        """Test that Podcast.next_update is kept current on partial saves"""
+        last_update = datetime(2014, 3, 31, 11, 00)
+        p = create_podcast(last_update=last_update, update_interval=10)
+
+        p.update_interval_factor = 2
+        p.save(update_fields=["update_interval_factor"])
+
+        p = Podcast.objects.get(pk=p.pk)
+        self.assertEqual(p.next_update, last_update + timedelta(hours=20))
+
+    def test_due_for_update(self):
+        """Test the order in which due podcasts are scheduled"""
+        now = datetime.utcnow()
+        long_ago = now - timedelta(hours=50)
+        recently = now - timedelta(hours=6)
+
+        hub = create_podcast(
+            last_update=long_ago,
+            update_interval=5,
+            subscribers=100,
+            hub="http://hub.example.com/",
+        )
+        popular = create_podcast(
+            last_update=recently, update_interval=5, subscribers=100
+        )
+        overdue = create_podcast(
+            last_update=long_ago, update_interval=5, subscribers=10
+        )
+        recent = create_podcast(last_update=recently, update_interval=5, subscribers=10)
+        not_due = create_podcast(last_update=now, update_interval=5, subscribers=1000)
+
+        podcasts = Podcast.objects.filter(
+            pk__in=[hub.pk, popular.pk, overdue.pk, recent.pk, not_due.pk]
+        )
+        due = list(podcasts.due_for_update(now))
+        self.assertEqual(due, [popular, overdue, recent, hub])
+
     def test_get_or_create_for_url(self):
         """Test that get_or_create_for_url returns existing Podcast"""
         URL = "http://example.com/get_or_create.rss"
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pubsub", "0002_created_modified"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="hubsubscription",
+            name="lease_expires",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
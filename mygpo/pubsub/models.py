@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from django.db import models
 
 from mygpo.podcasts.models import Podcast
@@ -8,6 +10,17 @@ class SubscriptionError(Exception):
     pass
 
 
+class HubSubscriptionQuerySet(models.QuerySet):
+    """QuerySet for HubSubscriptions"""
+
+    def live(self, until=None):
+        """Verified subscriptions whose lease lasts at least until ``until``"""
+        until = until or datetime.utcnow()
+        return self.filter(
+            mode=HubSubscription.SUBSCRIBE, verified=True, lease_expires__gt=until
+        )
+
+
 class HubSubscription(UpdateInfoModel):
     """A client-side PubSubHubbub subscription
 
@@ -39,3 +52,18 @@ class HubSubscription(UpdateInfoModel):
 
     # indicates whether the last mode change has already been verified
     verified = models.BooleanField(default=False)
+
+    # end of the lease granted by the hub; None if no lease is known
+    lease_expires = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = HubSubscriptionQuerySet.as_manager()
+
+    @property
+    def is_live(self):
+        """the subscription has been verified and its lease has not expired"""
+        return (
+            self.mode == self.SUBSCRIBE
+            and self.verified
+            and self.lease_expires is not None
+            and self.lease_expires > datetime.utcnow()
+        )
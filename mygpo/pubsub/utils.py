@@ -4,20 +4,25 @@
 #
 #
 
-import urllib.request, urllib.parse, urllib.error
-import urllib.request, urllib.error, urllib.parse
+import urllib.parse
 import logging
 
+import requests
+
 from django.urls import reverse
 
+from mygpo import httpclient
 from mygpo.utils import random_token
 from mygpo.pubsub.models import HubSubscription, SubscriptionError
 
 logger = logging.getLogger(__name__)
 
 
-def subscribe(podcast, feedurl, huburl, base_url, mode="subscribe"):
-    """Subscribe to the feed at a Hub"""
+def subscribe(podcast, feedurl, huburl, base_url, mode="subscribe", renew=False):
+    """Subscribe to the feed at a Hub
+
+    An existing verified subscription at the same hub is only sent again if
+    ``renew`` is set, eg to extend its lease."""
 
     logger.info("subscribing for {feed} at {hub}".format(feed=feedurl, hub=huburl))
     verify = "sync"
@@ -29,11 +34,12 @@ def subscribe(podcast, feedurl, huburl, base_url, mode="subscribe"):
             "verify_token": random_token(token_max_len),
             "mode": "",
             "podcast": podcast,
+            "hub_url": huburl,
         },
     )
 
     if subscription.mode == mode:
-        if subscription.verified:
+        if subscription.verified and subscription.hub_url == huburl and not renew:
             logger.info("subscription already exists")
             return
 
@@ -45,6 +51,7 @@ def subscribe(podcast, feedurl, huburl, base_url, mode="subscribe"):
         )
 
     subscription.topic_url = feedurl
+    subscription.hub_url = huburl
     subscription.mode = mode
     subscription.save()
 
@@ -56,33 +63,27 @@ def subscribe(podcast, feedurl, huburl, base_url, mode="subscribe"):
         "hub.verify_token": subscription.verify_token,
     }
 
-    data = urllib.parse.urlencode(list(data.items()))
     logger.debug("sending request: %s" % repr(data))
 
-    resp = None
-
     try:
-        resp = urllib.request.urlopen(huburl, data)
-
-    except urllib.error.HTTPError as e:
-        if e.code != 204:  # we actually expect a 204 return code
-            msg = "Could not send subscription to Hub: HTTP Error %d: %s" % (
-                e.code,
-                e.reason,
-            )
-            logger.warning(msg)
-            raise SubscriptionError(msg)
-
-    except Exception as e:
+        resp = httpclient.post(huburl, data=data)
+
+    except requests.exceptions.RequestException as e:
         msg = "Could not send subscription to Hub: %s" % repr(e)
         logger.warning(msg)
         raise SubscriptionError(msg)
 
-    if resp:
-        status = resp.code
-        if status != 204:
-            logger.warning("received incorrect status %d" % status)
-            raise SubscriptionError("Subscription has not been accepted by " "the Hub")
+    if resp.status_code >= 400:
+        msg = "Could not send subscription to Hub: HTTP Error %d: %s" % (
+            resp.status_code,
+            resp.reason,
+        )
+        logger.warning(msg)
+        raise SubscriptionError(msg)
+
+    if resp.status_code != 204:  # we actually expect a 204 return code
+        logger.warning("received incorrect status %d" % resp.status_code)
+        raise SubscriptionError("Subscription has not been accepted by " "the Hub")
 
 
 def callback_url(feedurl, base_url):
@@ -5,6 +5,7 @@
 #
 
 import logging
+from datetime import datetime, timedelta
 
 from django.http import HttpResponseNotFound, HttpResponse
 from django.views import View
@@ -67,6 +68,7 @@ class SubscribeView(View):
             return HttpResponseNotFound()
 
         subscription.verified = True
+        subscription.lease_expires = get_lease_expiry(mode, lease_seconds)
         subscription.save()
 
         logger.info("subscription confirmed")
@@ -101,3 +103,15 @@ class SubscribeView(View):
         subscription_updated.send(sender=feed_url)
 
         return HttpResponse(status=200)
+
+
+def get_lease_expiry(mode, lease_seconds):
+    """Returns when a lease of ``lease_seconds`` seconds, granted now, expires"""
+    if mode != HubSubscription.SUBSCRIBE:
+        return None
+
+    try:
+        return datetime.utcnow() + timedelta(seconds=int(lease_seconds))
+    except (TypeError, ValueError):
+        logger.warning("invalid lease_seconds: %s", lease_seconds)
+        return None
@@ -103,6 +103,11 @@ MEDIA_ROOT = os.getenv(
 
 MEDIA_URL = "/media/"
 
+# maximum number of logo files whose existence and modification time are
+# cached in each process, and the number of seconds they are cached
+LOGO_CACHE_SIZE = int(os.getenv("LOGO_CACHE_SIZE", 10000))
+LOGO_CACHE_TTL = int(os.getenv("LOGO_CACHE_TTL", 300))
+
 
 ARCHIVE_ROOT = os.getenv(
     "ARCHIVE_ROOT", os.path.abspath(os.path.join(BASE_DIR, "..", "archive"))
@@ -337,6 +342,20 @@ STAFF_TOKEN = os.getenv("STAFF_TOKEN", None)
 # The User-Agent string used for outgoing HTTP requests
 USER_AGENT = "gpodder.net (+https://github.com/gpodder/mygpo)"
 
+# Outgoing HTTP requests, see mygpo.httpclient
+
+# number of hosts for which connections are pooled
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 100))
+
+# maximum number of connections that are kept open per host
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+
+# number of retries for failed connections and 502, 503 and 504 responses
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+
+# default timeout in seconds
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+
 # Base URL of the website that is used if the actually used parameters is not
 # available.  Request handlers, for example, can access the requested domain.
 # Code that runs in background can not do this, and therefore requires a
@@ -353,6 +372,31 @@ CELERY_RESULT_EXPIRES = 60 * 60  # 1h expiry time in seconds
 
 CELERY_ACCEPT_CONTENT = ["json"]
 
+# periodic tasks; they are installed in the database by the beat scheduler
+# (see Procfile), where their schedules can be changed in the admin
+CELERY_BEAT_SCHEDULE = {
+    "update-related-podcasts": {
+        "task": "mygpo.data.tasks.update_all_related_podcasts",
+        "schedule": 24 * 60 * 60,  # daily
+    },
+    "renew-hub-subscriptions": {
+        "task": "mygpo.data.tasks.renew_hub_subscriptions",
+        "schedule": 60 * 60,  # hourly
+    },
+    "update-toplists": {
+        "task": "mygpo.directory.tasks.update_toplists",
+        "schedule": 60 * 60,  # hourly
+    },
+    "update-episode-listeners": {
+        "task": "mygpo.history.tasks.update_episode_listeners",
+        "schedule": 60 * 60,  # hourly
+    },
+    "reconcile-subscriber-counts": {
+        "task": "mygpo.directory.tasks.reconcile_subscriber_counts",
+        "schedule": 24 * 60 * 60,  # daily
+    },
+}
+
 
 # URL where users of the site can get support
 SUPPORT_URL = os.getenv("SUPPORT_URL", "")
@@ -360,6 +404,35 @@ SUPPORT_URL = os.getenv("SUPPORT_URL", "")
 
 FEEDSERVICE_URL = os.getenv("FEEDSERVICE_URL", "http://feeds.gpodder.net/")
 
+# backend that fetches and parses feeds, see mygpo.data.parsers
+FEED_PARSER = os.getenv("FEED_PARSER", "mygpo.data.parsers.FeedServiceParser")
+
+# number of podcasts that are updated in one task
+FEED_UPDATE_BATCH_SIZE = int(os.getenv("FEED_UPDATE_BATCH_SIZE", 10))
+
+# number of Celery worker processes that are available for podcast updates;
+# used to estimate how many updates can be scheduled per hour
+FEED_UPDATE_WORKERS = int(os.getenv("FEED_UPDATE_WORKERS", 1))
+
+# maximum number of concurrent updates of podcasts on the same host
+FEED_UPDATE_HOST_CONCURRENCY = int(os.getenv("FEED_UPDATE_HOST_CONCURRENCY", 4))
+
+# minimum number of seconds between starting two updates of podcasts on the
+# same host; 0 to disable
+FEED_UPDATE_HOST_INTERVAL = int(os.getenv("FEED_UPDATE_HOST_INTERVAL", 0))
+
+# number of seconds for which a podcast update is delayed after a PubSubHubbub
+# notification; further notifications within that time are dropped
+PUBSUB_UPDATE_DELAY = int(os.getenv("PUBSUB_UPDATE_DELAY", 60))
+
+# number of hub subscriptions that are sent or renewed per run of
+# renew_hub_subscriptions
+PUBSUB_RENEWAL_BATCH_SIZE = int(os.getenv("PUBSUB_RENEWAL_BATCH_SIZE", 100))
+
+# factor by which the update interval of podcasts with a live hub subscription
+# is lengthened
+PUBSUB_POLL_INTERVAL_FACTOR = float(os.getenv("PUBSUB_POLL_INTERVAL_FACTOR", 4))
+
 
 # time for how long an activation is valid; after that, an unactivated user
 # will be deleted
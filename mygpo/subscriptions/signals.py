@@ -2,5 +2,6 @@ import django.dispatch
 
 # indicates that a podcast was subscribed or unsubscribed
 # ``sender`` will equal the user. Additionally the parameters ``user`` and
-# ``subscribed`` will be provided
+# ``subscribed`` will be provided. ``changes_subscribers`` is set for the event
+# of a user's first subscription or last unsubscription of the podcast
 subscription_changed = django.dispatch.Signal()
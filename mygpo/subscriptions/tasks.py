@@ -176,12 +176,24 @@ def _affected_clients(client):
 
 
 def _fire_events(podcast, user, clients, subscribed):
-    """Fire the events for subscription / unsubscription"""
-    for client in clients:
+    """Fire the events for subscription / unsubscription
+
+    The first event indicates whether the user has subscribed to the podcast
+    on their first client, or unsubscribed from it on their last one."""
+    changes_subscribers = False
+    if clients:
+        remaining = Subscription.objects.filter(user=user, podcast=podcast).count()
+        if subscribed:
+            changes_subscribers = remaining == len(clients)
+        else:
+            changes_subscribers = remaining == 0
+
+    for n, client in enumerate(clients):
         subscription_changed.send(
             sender=podcast.__class__,
             instance=podcast,
             user=user,
             client=client,
             subscribed=subscribed,
+            changes_subscribers=changes_subscribers and n == 0,
         )
@@ -46,6 +46,27 @@ class TestSubscribe(TestCase):
         self.assertEqual(subscriptions.count(), 1)
         subscriptions[0].delete()
 
+    def test_subscriber_count(self):
+        """Only the first subscription and last unsubscription are counted"""
+        from mygpo.subscriptions.tasks import subscribe, unsubscribe
+
+        Client.objects.create(user=self.user, uid="dev2", id=uuid.uuid1())
+
+        def subscribers():
+            return Podcast.objects.get(pk=self.podcast.pk).subscribers
+
+        subscribe(self.podcast.pk, self.user.pk, "dev1")
+        self.assertEqual(subscribers(), 1)
+
+        subscribe(self.podcast.pk, self.user.pk, "dev2")
+        self.assertEqual(subscribers(), 1)
+
+        unsubscribe(self.podcast.pk, self.user.pk, "dev1")
+        self.assertEqual(subscribers(), 1)
+
+        unsubscribe(self.podcast.pk, self.user.pk, "dev2")
+        self.assertEqual(subscribers(), 0)
+
     def tearDown(self):
         self.podcast.delete()
         self.client.delete()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import json
+import math
 import subprocess
 import sys
 import re
@@ -181,6 +182,25 @@ def parse_range(s, min, max, default=None):
         return default if default is not None else out_type((max - min) / 2)
 
 
+def percentile(values, p):
+    """Returns the p-th percentile (nearest rank) of a list of sorted values
+
+    >>> percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50)
+    5
+
+    >>> percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 90)
+    9
+
+    >>> percentile([], 50) is None
+    True
+    """
+    if not values:
+        return None
+
+    rank = max(int(math.ceil(p / 100 * len(values))), 1)
+    return values[rank - 1]
+
+
 def get_timestamp(datetime_obj):
     """Returns the timestamp as an int for the given datetime object
 
@@ -209,31 +229,129 @@ def is_url(string):
     return bool(re_url.match(string))
 
 
-# from http://stackoverflow.com/questions/2892931/longest-common-substring-from-more-than-two-strings-python
-# this does not increase asymptotical complexity
-# but can still waste more time than it saves.
 def shortest_of(strings):
     return min(strings, key=len)
 
 
+class SuffixAutomaton(object):
+    """Suffix automaton of a string
+
+    The automaton recognizes all substrings of the string. Each state
+    represents a set of substrings that end at the same positions; the
+    longest of them has the length ``length[state]`` and its first
+    occurrence ends at ``end_pos[state]``. It is built in linear time."""
+
+    def __init__(self, string):
+        self.transitions = [{}]
+        self.link = [-1]
+        self.length = [0]
+        self.end_pos = [-1]
+
+        last = 0
+        for pos, char in enumerate(string):
+            last = self._extend(last, pos, char)
+
+        # states ordered by decreasing length, so that each state comes before
+        # the state its suffix link points to
+        self.by_length = sorted(
+            range(len(self.length)), key=self.length.__getitem__, reverse=True
+        )
+
+    def _add_state(self, length, link, end_pos, transitions=None):
+        self.transitions.append(dict(transitions or {}))
+        self.link.append(link)
+        self.length.append(length)
+        self.end_pos.append(end_pos)
+        return len(self.length) - 1
+
+    def _extend(self, last, pos, char):
+        cur = self._add_state(self.length[last] + 1, 0, pos)
+
+        p = last
+        while p != -1 and char not in self.transitions[p]:
+            self.transitions[p][char] = cur
+            p = self.link[p]
+
+        if p == -1:
+            return cur
+
+        q = self.transitions[p][char]
+        if self.length[p] + 1 == self.length[q]:
+            self.link[cur] = q
+            return cur
+
+        clone = self._add_state(
+            self.length[p] + 1, self.link[q], self.end_pos[q], self.transitions[q]
+        )
+        while p != -1 and self.transitions[p].get(char) == q:
+            self.transitions[p][char] = clone
+            p = self.link[p]
+
+        self.link[q] = clone
+        self.link[cur] = clone
+        return cur
+
+    def match_lengths(self, text):
+        """Returns, per state, the length of its longest substring in text"""
+        matched = [0] * len(self.length)
+
+        state, length = 0, 0
+        for char in text:
+            while state != 0 and char not in self.transitions[state]:
+                state = self.link[state]
+                length = self.length[state]
+
+            if char in self.transitions[state]:
+                state = self.transitions[state][char]
+                length += 1
+
+            matched[state] = max(matched[state], length)
+
+        # a substring that is found also contains the suffixes of its state
+        for state in self.by_length:
+            link = self.link[state]
+            if matched[state] and link > 0:
+                matched[link] = max(matched[link], self.length[link])
+
+        return matched
+
+
 def longest_substr(strings):
     """
     Returns the longest common substring of the given strings
-    """
 
-    substr = ""
+    A suffix automaton of the shortest string is matched against all
+    strings, so the runtime is linear in their total length.
+
+    >>> longest_substr(['Episode 12: Foo', 'Episode 3: Bar', 'My Episode 4'])
+    'Episode '
+
+    >>> longest_substr(['abcab', 'xabc', 'cabc'])
+    'abc'
+
+    >>> longest_substr(['abc', 'def'])
+    ''
+
+    >>> longest_substr([])
+    ''
+    """
     if not strings:
-        return substr
+        return ""
+
     reference = shortest_of(strings)
-    length = len(reference)
-    # find a suitable slice i:j
-    for i in range(length):
-        # only consider strings long at least len(substr) + 1
-        for j in range(i + len(substr) + 1, length):
-            candidate = reference[i:j]
-            if all(candidate in text for text in strings):
-                substr = candidate
-    return substr
+    automaton = SuffixAutomaton(reference)
+
+    common = list(automaton.length)
+    for text in strings:
+        matched = automaton.match_lengths(text)
+        common = [min(c, m) for c, m in zip(common, matched)]
+
+    # the longest common substring; of several, the one that occurs first
+    length, end_pos = max(
+        (length, -end_pos) for length, end_pos in zip(common, automaton.end_pos)
+    )
+    end_pos = -end_pos
+    return reference[end_pos - length + 1 : end_pos + 1]
 
 
 def file_hash(f, h=hashlib.md5, block_size=2**20):
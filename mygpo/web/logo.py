@@ -1,14 +1,19 @@
 import os.path
 import io
+import time
+import uuid
 import requests
 import hashlib
 import socket
 import struct
+import threading
+from collections import OrderedDict
 
 from PIL import Image
 
 from django.urls import reverse
 from django.conf import settings
+from django.core.cache import cache
 from django.http import Http404, HttpResponseRedirect
 from django.views import View
 from django.utils.decorators import method_decorator
@@ -16,7 +21,14 @@ from django.views.decorators.http import last_modified
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.core.files.storage import FileSystemStorage
 
+from mygpo import httpclient
 from mygpo.utils import file_hash
+from mygpo.data.models import HTTPCacheInfo
+from mygpo.constants import (
+    PODCAST_LOGO_SIZE,
+    PODCAST_LOGO_MEDIUM_SIZE,
+    PODCAST_LOGO_BIG_SIZE,
+)
 
 import logging
 
@@ -27,16 +39,148 @@ logger = logging.getLogger(__name__)
 # https://docs.djangoproject.com/en/1.11/ref/files/storage/
 LOGO_STORAGE = FileSystemStorage(location=settings.MEDIA_ROOT)
 
+# sizes (in pixels) of the thumbnails that are created for each logo; other
+# sizes are served from the next larger thumbnail. The API accepts sizes of
+# up to 256 pixels.
+THUMBNAIL_SIZES = sorted(
+    {PODCAST_LOGO_SIZE, PODCAST_LOGO_MEDIUM_SIZE, PODCAST_LOGO_BIG_SIZE, 256}
+)
 
-def _last_modified(request, size, prefix, filename):
 
-    target = os.path.join("logo", str(size), prefix, filename)
+# seconds after which cached logo files are checked against their version in
+# the shared cache, see LogoFileCache
+LOGO_VERSION_CHECK_INTERVAL = 10
+
+
+def get_thumbnail_size(size):
+    """Returns the registered thumbnail size that is used for ``size``
+
+    >>> get_thumbnail_size(32)
+    32
+
+    >>> get_thumbnail_size(100)
+    128
+
+    >>> get_thumbnail_size(1000)
+    256
+    """
+    for thumbnail_size in THUMBNAIL_SIZES:
+        if thumbnail_size >= size:
+            return thumbnail_size
+
+    return THUMBNAIL_SIZES[-1]
+
+
+class LogoFileCache(object):
+    """In-process LRU cache of the existence and mtime of logo files
+
+    Entries are keyed by size (or "original") and filename, and expire after
+    ``ttl`` seconds. At most ``maxsize`` entries are kept.
+
+    Logos are changed by other processes (feed updates, Celery workers). They
+    invalidate the logo by storing a new version of it in the shared Django
+    cache. An entry is checked against that version at most once every
+    ``check_interval`` seconds, and discarded if the version has changed.
+    Without a shared cache backend, changes are only picked up once the
+    entries expire."""
+
+    def __init__(self, maxsize, ttl, check_interval=LOGO_VERSION_CHECK_INTERVAL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, size, prefix, filename):
+        """Returns whether the file exists, and its modification time
+
+        The modification time is None if it is not supported by the
+        storage."""
+        key = (size, filename)
+        now = time.monotonic()
+
+        # entries are lists of expiry time, time of the next version check,
+        # version and file info
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                entry = None
+
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[3]
+
+        version = cache.get(self._version_key(filename))
+
+        with self._lock:
+            # the entry could have been removed in the meantime
+            if (
+                entry is not None
+                and entry is self._entries.get(key)
+                and entry[2] == version
+            ):
+                entry[1] = now + self.check_interval
+                self._entries.move_to_end(key)
+                return entry[3]
+
+        info = self._stat(size, prefix, filename)
+
+        with self._lock:
+            self._entries[key] = [
+                now + self.ttl,
+                now + self.check_interval,
+                version,
+                info,
+            ]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return info
+
+    def invalidate(self, filename):
+        """Removes the entries of all sizes of the logo in all processes"""
+        # entries older than the TTL have expired anyway, so the version only
+        # needs to be kept for that long
+        cache.set(self._version_key(filename), uuid.uuid4().hex, self.ttl)
+
+        with self._lock:
+            for size in THUMBNAIL_SIZES + ["original"]:
+                self._entries.pop((size, filename), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _version_key(filename):
+        return "logo-version-%s" % filename
+
+    @staticmethod
+    def _stat(size, prefix, filename):
+        if size == "original":
+            path = CoverArt.get_original_path(prefix, filename)
+        else:
+            path = CoverArt.get_thumbnail_path(size, prefix, filename)
+
+        try:
+            return True, LOGO_STORAGE.get_modified_time(path)
+
+        except FileNotFoundError:
+            return False, None
+
+        except NotImplementedError:
+            return LOGO_STORAGE.exists(path), None
 
-    try:
-        return LOGO_STORAGE.get_modified_time(target)
 
-    except (FileNotFoundError, NotImplementedError):
-        return None
+LOGO_FILE_CACHE = LogoFileCache(settings.LOGO_CACHE_SIZE, settings.LOGO_CACHE_TTL)
+
+
+def _last_modified(request, size, prefix, filename):
+
+    size = get_thumbnail_size(int(size))
+    _exists, modified = LOGO_FILE_CACHE.get(size, get_prefix(filename), filename)
+    return modified
 
 
 class CoverArt(View):
@@ -46,56 +190,24 @@ class CoverArt(View):
     @method_decorator(last_modified(_last_modified))
     def get(self, request, size, prefix, filename):
 
-        size = int(size)
+        size = get_thumbnail_size(int(size))
 
         prefix = get_prefix(filename)
         target = self.get_thumbnail_path(size, prefix, filename)
         original = self.get_original_path(prefix, filename)
 
-        if self.storage.exists(target):
+        exists, _modified = LOGO_FILE_CACHE.get(size, prefix, filename)
+        if exists:
             return self.send_file(target)
 
-        if not self.storage.exists(original):
+        # thumbnails are created in the background; until they are
+        # available, the original is served
+        exists, _modified = LOGO_FILE_CACHE.get("original", prefix, filename)
+        if not exists:
             logger.warning("Original cover {} not found".format(original))
             raise Http404("Cover Art not available" + original)
 
-        try:
-            fp = self.storage.open(original, "rb")
-            im = Image.open(fp)
-            if im.mode not in ("RGB", "RGBA"):
-                im = im.convert("RGBA")
-        except IOError as ioe:
-            logger.warning("Cover file {} cannot be opened: {}".format(original, ioe))
-            raise Http404("Cannot open cover file") from ioe
-
-        try:
-            im.thumbnail((size, size), Image.LANCZOS)
-            resized = im
-        except (struct.error, IOError, IndexError) as ex:
-            # raised when trying to read an interlaced PNG;
-            logger.warning("Could not create thumbnail: %s", str(ex))
-
-            # we use the original instead
-            return self.send_file(original)
-
-        sio = io.BytesIO()
-
-        try:
-            resized.save(
-                sio,
-                "JPEG" if im.mode == "RGB" else "PNG",
-                optimize=True,
-                progression=True,
-                quality=80,
-            )
-        except IOError as ex:
-            return self.send_file(original)
-        finally:
-            fp.close()
-
-        self.storage.save(target, sio)
-
-        return self.send_file(target)
+        return self.send_file(original)
 
     @staticmethod
     def get_thumbnail_path(size, prefix, filename):
@@ -105,17 +217,75 @@ class CoverArt(View):
     def get_dir(filename):
         return os.path.dirname(filename)
 
-    @staticmethod
-    def remove_existing_thumbnails(prefix, filename):
-        dirs, _files = LOGO_STORAGE.listdir("logo")  # TODO: cache list of sizes
-        for size in dirs:
-            if size == "original":
-                continue
-
-            path = os.path.join("logo", size, prefix, filename)
+    @classmethod
+    def remove_existing_thumbnails(cls, prefix, filename):
+        for size in THUMBNAIL_SIZES:
+            path = cls.get_thumbnail_path(size, prefix, filename)
             logger.info("Removing {}".format(path))
             LOGO_STORAGE.delete(path)
 
+    @classmethod
+    def get_missing_sizes(cls, prefix, filename):
+        """Returns the registered sizes for which no thumbnail exists"""
+        return [
+            size
+            for size in THUMBNAIL_SIZES
+            if not LOGO_STORAGE.exists(cls.get_thumbnail_path(size, prefix, filename))
+        ]
+
+    @classmethod
+    def create_thumbnails(cls, prefix, filename, sizes=None):
+        """Creates thumbnails of the original logo in the registered sizes
+
+        Existing thumbnails are replaced. Returns the number of thumbnails
+        that have been created."""
+        original = cls.get_original_path(prefix, filename)
+        sizes = THUMBNAIL_SIZES if sizes is None else sizes
+
+        try:
+            with LOGO_STORAGE.open(original, "rb") as fp:
+                im = Image.open(fp)
+                if im.mode not in ("RGB", "RGBA"):
+                    im = im.convert("RGBA")
+                im.load()
+        except IOError as ioe:
+            logger.warning("Cover file {} cannot be opened: {}".format(original, ioe))
+            return 0
+
+        created = 0
+        for size in sorted(sizes, reverse=True):
+            try:
+                thumbnail = cls._resize(im, size)
+            except (struct.error, IOError, IndexError) as ex:
+                # raised when trying to read an interlaced PNG; the original
+                # is served instead
+                logger.warning("Could not create thumbnail: %s", str(ex))
+                return created
+
+            target = cls.get_thumbnail_path(size, prefix, filename)
+            LOGO_STORAGE.delete(target)
+            LOGO_STORAGE.save(target, thumbnail)
+            created += 1
+
+        LOGO_FILE_CACHE.invalidate(filename)
+        return created
+
+    @staticmethod
+    def _resize(im, size):
+        """returns the image scaled to fit into size x size, as a file"""
+        resized = im.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+
+        sio = io.BytesIO()
+        resized.save(
+            sio,
+            "JPEG" if resized.mode == "RGB" else "PNG",
+            optimize=True,
+            progression=True,
+            quality=80,
+        )
+        return sio
+
     @staticmethod
     def get_original_path(prefix, filename):
         return os.path.join("logo", "original", prefix, filename)
@@ -134,28 +304,49 @@ class CoverArt(View):
 
             filename = cls.get_original_path(prefix, image_sha1)
 
-            # get hash of existing file
-            if LOGO_STORAGE.exists(filename):
-                with LOGO_STORAGE.open(filename, "rb") as f:
-                    old_hash = file_hash(f).digest()
-            else:
-                old_hash = ""
+            # validators of the previous download; they can only be used if
+            # we still have the logo from that download
+            cache_info = HTTPCacheInfo.objects.for_url(cover_art_url)
+            original_exists = LOGO_STORAGE.exists(filename)
+
+            headers = {}
+            if original_exists and cache_info.pk is not None:
+                headers = cache_info.get_request_headers()
 
             logger.info("Logo {}, saving to {}".format(cover_art_url, filename))
+            response = httpclient.get(cover_art_url, headers=headers)
+
+            if headers and cache_info.is_unchanged(response):
+                logger.info("Logo has not changed")
+                return cover_art_url
 
-            # save new cover art
-            LOGO_STORAGE.delete(filename)
-            source = io.BytesIO(requests.get(cover_art_url).content)
-            LOGO_STORAGE.save(filename, source)
+            new_hash = hashlib.sha1(response.content).hexdigest()
 
-            # get hash of new file
-            with LOGO_STORAGE.open(filename, "rb") as f:
-                new_hash = file_hash(f).digest()
+            # get hash of existing file
+            if not original_exists:
+                old_hash = ""
+            elif cache_info.content_hash:
+                old_hash = cache_info.content_hash
+            else:
+                with LOGO_STORAGE.open(filename, "rb") as f:
+                    old_hash = file_hash(f, hashlib.sha1).hexdigest()
 
-            # remove thumbnails if cover changed
             if old_hash != new_hash:
+                # save new cover art
+                LOGO_STORAGE.delete(filename)
+                LOGO_STORAGE.save(filename, io.BytesIO(response.content))
+
+                # remove thumbnails if cover changed, and create new ones
                 logger.info("Removing thumbnails")
-                cls.remove_existing_thumbnails(prefix, filename)
+                cls.remove_existing_thumbnails(prefix, image_sha1)
+                LOGO_FILE_CACHE.invalidate(image_sha1)
+
+                from mygpo.web.tasks import create_thumbnails
+
+                create_thumbnails.delay(prefix, image_sha1)
+
+            cache_info.set_from_response(response)
+            cache_info.save()
 
             return cover_art_url
 
@@ -181,6 +372,7 @@ def get_logo_url(podcast, size):
 
     if podcast.logo_url:
         filename = hashlib.sha1(podcast.logo_url.encode("utf-8")).hexdigest()
+        size = get_thumbnail_size(size)
         return reverse("logo", args=[size, get_prefix(filename), filename])
 
     else:
@@ -0,0 +1,60 @@
+import os.path
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from mygpo.web.logo import CoverArt, LOGO_STORAGE
+
+
+def iter_logos():
+    """Yields prefix and filename of all original logos in the storage"""
+    original_dir = os.path.join("logo", "original")
+    prefixes, _files = LOGO_STORAGE.listdir(original_dir)
+    for prefix in sorted(prefixes):
+        _dirs, filenames = LOGO_STORAGE.listdir(os.path.join(original_dir, prefix))
+        for filename in filenames:
+            yield prefix, filename
+
+
+def backfill(logo):
+    """Creates the missing thumbnails of a logo"""
+    prefix, filename = logo
+    sizes = CoverArt.get_missing_sizes(prefix, filename)
+    if not sizes:
+        return 0
+
+    return CoverArt.create_thumbnails(prefix, filename, sizes)
+
+
+class Command(BaseCommand):
+    """
+    Creates missing logo thumbnails
+
+    Thumbnails are created for all registered sizes of all logos in the
+    storage. Logos are processed in parallel by a pool of processes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            action="store",
+            dest="workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of processes that create thumbnails",
+        )
+
+    def handle(self, *args, **options):
+        num_logos = 0
+        num_created = 0
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            for created in executor.map(backfill, iter_logos(), chunksize=100):
+                num_logos += 1
+                num_created += created
+
+        self.stdout.write(
+            "Created {created} thumbnails for {logos} logos".format(
+                created=num_created, logos=num_logos
+            )
+        )
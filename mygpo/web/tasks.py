@@ -0,0 +1,14 @@
+from celery import shared_task
+
+from mygpo.web.logo import CoverArt
+
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+
+@shared_task
+def create_thumbnails(prefix, filename):
+    """Creates the thumbnails of a new or changed logo"""
+    created = CoverArt.create_thumbnails(prefix, filename)
+    logger.info("Created %d thumbnails of logo %s", created, filename)
@@ -1,5 +1,7 @@
 import uuid
+import hashlib
 import os.path
+from unittest import mock
 
 import requests
 import responses
@@ -11,7 +13,14 @@ from django.core.files.storage import FileSystemStorage
 from django.contrib.auth import get_user_model
 
 from mygpo.podcasts.models import Podcast, Episode, Slug
-from mygpo.web.logo import CoverArt, get_logo_url
+from mygpo.web import tasks
+from mygpo.web.logo import (
+    CoverArt,
+    LogoFileCache,
+    get_logo_url,
+    get_prefix,
+    LOGO_FILE_CACHE,
+)
 from mygpo.test import create_auth_string, anon_request
 
 import logging
@@ -128,6 +137,14 @@ class PodcastLogoTests(TestCase):
         )
         self.client = Client()
 
+        # create thumbnails immediately instead of in the background
+        create_thumbnails = tasks.create_thumbnails
+        patcher = mock.patch.object(create_thumbnails, "delay", create_thumbnails)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        LOGO_FILE_CACHE.clear()
+
     def tearDown(self):
         self.podcast.delete()
 
@@ -205,18 +222,73 @@ class PodcastLogoTests(TestCase):
             def open(*args, **kwargs):
                 raise IOError
 
-        self._save_logo()
         from mygpo.web import logo
 
         _logo_storage = logo.LOGO_STORAGE
         logo.LOGO_STORAGE = ErrFileSystemStorage(location=settings.MEDIA_ROOT)
 
+        try:
+            self._save_logo()
+        finally:
+            logo.LOGO_STORAGE = _logo_storage
+
+        # no thumbnails could be created, so the original is served
         logo_url = get_logo_url(self.podcast, 32)
 
         response = self.client.get(logo_url)
-        self.assertEqual(404, response.status_code)
+        self.assertEqual(302, response.status_code)
+        self.assertIn("/logo/original/", response["Location"])
+
+    def test_thumbnail_sizes(self):
+        """Thumbnails are created for all registered sizes"""
+        self._save_logo()
+
+        filename = hashlib.sha1(self.URL.encode("utf-8")).hexdigest()
+        prefix = get_prefix(filename)
+        self.assertEqual(CoverArt.get_missing_sizes(prefix, filename), [])
+
+        # unregistered sizes are served from the next larger thumbnail
+        response = self.client.get(reverse("logo", args=[100, prefix, filename]))
+        self.assertEqual(302, response.status_code)
+        self.assertIn("/logo/128/", response["Location"])
+
+    def test_file_cache(self):
+        """Repeated requests for a logo do not access the storage or cache"""
+        from mygpo.web import logo
+
+        self._save_logo()
+        logo_url = get_logo_url(self.podcast, 32)
+        self.client.get(logo_url)
+
+        with (
+            mock.patch.object(logo, "LOGO_STORAGE", wraps=logo.LOGO_STORAGE) as st,
+            mock.patch.object(logo, "cache", wraps=logo.cache) as shared_cache,
+        ):
+            response = self.client.get(logo_url)
+
+        self.assertEqual(302, response.status_code)
+        st.exists.assert_not_called()
+        st.get_modified_time.assert_not_called()
+        shared_cache.get.assert_not_called()
 
-        logo.LOGO_STORAGE = _logo_storage
+    def test_file_cache_invalidation(self):
+        """Logos changed by other processes are not served from the cache"""
+        self._save_logo()
+        filename = hashlib.sha1(self.URL.encode("utf-8")).hexdigest()
+        prefix = get_prefix(filename)
+
+        # the cache of a web process that checks the version on every lookup
+        web_cache = LogoFileCache(10, 300, check_interval=0)
+        exists, _modified = web_cache.get(32, prefix, filename)
+        self.assertTrue(exists)
+
+        # the cache of another process, eg the one that updates the logo
+        other_cache = LogoFileCache(10, 300)
+        CoverArt.remove_existing_thumbnails(prefix, filename)
+        other_cache.invalidate(filename)
+
+        exists, _modified = web_cache.get(32, prefix, filename)
+        self.assertFalse(exists)
 
     def test_new_logo(self):
         with (
@@ -269,6 +341,36 @@ class PodcastLogoTests(TestCase):
                 list(response2.streaming_content), list(response3.streaming_content)
             )
 
+    def test_logo_not_modified(self):
+        """A logo is not downloaded again if it has not been modified"""
+        with responses.RequestsMock() as rsps, open(IMG_PATH1, "rb") as body:
+            rsps.add(
+                responses.GET,
+                self.URL,
+                status=200,
+                body=body,
+                content_type="image/png",
+                headers={"ETag": '"logo-v1"'},
+            )
+            rsps.add(
+                responses.GET,
+                self.URL,
+                status=304,
+                match=[
+                    responses.matchers.header_matcher({"If-None-Match": '"logo-v1"'})
+                ],
+            )
+
+            CoverArt.save_podcast_logo(self.URL)
+            response1 = self._fetch_cover(self.podcast)
+
+            self.assertEqual(CoverArt.save_podcast_logo(self.URL), self.URL)
+            response2 = self._fetch_cover(self.podcast)
+
+        self.assertEqual(
+            list(response1.streaming_content), list(response2.streaming_content)
+        )
+
 
 class PublisherPageTests(TestCase):
     """Test the publisher page"""